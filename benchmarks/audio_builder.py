@@ -0,0 +1,95 @@
+"""
+Building a 2-hour voice track from 3,000 clips: `audio.AudioBuilder` (clips and silence appended)
+and `audio.TrackBuffer` (clips placed at their offsets) against repeated `AudioSegment` concatenation,
+which copies the whole track on every clip (measured on the first clips only, it is quadratic).
+All of them must build the same audio.
+
+    python -m benchmarks.audio_builder [--clips 3000] [--hours 2] [--concat-clips 300]
+"""
+from __future__ import annotations
+
+import argparse
+from time import perf_counter
+
+import numpy as np
+
+from fastdub.audio import AudioBuilder, AudioSegment, TrackBuffer
+
+FRAME_RATE = 22050
+DISTINCT_CLIPS = 32
+BLOCK_MS = 20
+MIB = 1024 * 1024
+
+
+def make_track(clips: int, hours: float, seed: int = 0) -> tuple[list[AudioSegment], list[float]]:
+    """
+    Clips (shared by lines to save memory) and silence before every clip in ms, filling the track duration.
+    Durations are whole 20 ms blocks (441 frames), so appended and placed clips start at the same frames.
+    """
+    rng = np.random.default_rng(seed)
+    slot_ms = hours * 3600000 // clips // BLOCK_MS * BLOCK_MS
+    distinct = [AudioSegment(rng.integers(-8000, 8000, blocks * FRAME_RATE * BLOCK_MS // 1000, np.int16).tobytes(),
+                             sample_width=2, frame_rate=FRAME_RATE, channels=1)
+                for blocks in (rng.uniform(0.4, 0.9, DISTINCT_CLIPS) * slot_ms // BLOCK_MS).astype(int)]
+    track = [distinct[i] for i in rng.integers(0, DISTINCT_CLIPS, clips)]
+    return track, [slot_ms - round(clip.duration_ms) for clip in track]
+
+
+def build(clips: list[AudioSegment], silences: list[float]) -> AudioSegment:
+    builder = AudioBuilder()
+    for clip, silence_ms in zip(clips, silences):
+        builder.append_silence(silence_ms).append(clip)
+    return builder.build()
+
+
+def place(clips: list[AudioSegment], silences: list[float]) -> AudioSegment:
+    positions = np.cumsum(silences) + np.cumsum([0., *(clip.duration_ms for clip in clips[:-1])])
+    track = TrackBuffer(positions[-1] + clips[-1].duration_ms)
+    for clip, position_ms in zip(clips, positions.tolist()):
+        track.place(clip, position_ms)
+    return track.to_segment()
+
+
+def concatenate(clips: list[AudioSegment], silences: list[float]) -> AudioSegment:
+    track = AudioSegment.silent(0, FRAME_RATE)
+    for clip, silence_ms in zip(clips, silences):
+        # not AudioSegment.silent: it may round the frames of the silence down
+        silence = AudioSegment(bytes(int(silence_ms * FRAME_RATE / 1000.) * 2), sample_width=2, frame_rate=FRAME_RATE,
+                               channels=1)
+        track = track + silence + clip
+    return track
+
+
+def _timed(function, *args) -> tuple[float, AudioSegment]:
+    start = perf_counter()
+    result = function(*args)
+    return perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--clips', type=int, default=3000)
+    parser.add_argument('--hours', type=float, default=2.)
+    parser.add_argument('--concat-clips', type=int, default=300, help='Clips built by concatenation')
+    args = parser.parse_args()
+
+    clips, silences = make_track(args.clips, args.hours)
+    build_elapsed, built = _timed(build, clips, silences)
+    place_elapsed, placed = _timed(place, clips, silences)
+    if built.raw_data != placed.raw_data:
+        raise AssertionError('AudioBuilder and TrackBuffer tracks differ')
+    print(f'{args.clips} clips, {built.duration_ms / 3600000:.2f}h track, {len(built.raw_data) / MIB:.0f} MiB')
+    print(f'AudioBuilder: {build_elapsed:7.3f}s')
+    print(f' TrackBuffer: {place_elapsed:7.3f}s')
+
+    if count := min(args.concat_clips, args.clips):
+        concat_elapsed, concatenated = _timed(concatenate, clips[:count], silences[:count])
+        prefix_elapsed, prefix = _timed(build, clips[:count], silences[:count])
+        if concatenated.raw_data != prefix.raw_data:
+            raise AssertionError('concatenated and built tracks differ')
+        print(f'first {count} clips: concatenation {concat_elapsed:7.3f}s, AudioBuilder {prefix_elapsed:7.3f}s '
+              f'({concat_elapsed / prefix_elapsed:.0f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+TTS cache clip formats (`cache.CLIP_FORMATS`): on-disk size and read throughput (`cache.read_clip`).
+
+The same synthetic speech-like clips are stored by `TTSCache.put` in every format and read back
+(files are in the OS page cache, so the reads measure decoding rather than the disk).
+FLAC is read by soundfile (in-process) if it is installed, else by ffmpeg (a process per clip),
+it is skipped if neither is found.
+
+    python -m benchmarks.cache_formats [--clips 300] [--format wav --format pcm]
+"""
+from __future__ import annotations
+
+import argparse
+import shutil
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+from benchmarks.speed_change import make_clips
+from fastdub import cache
+
+MIB = 1024 * 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--clips', type=int, default=300)
+    parser.add_argument('--format', action='append', choices=cache.CLIP_FORMATS)
+    args = parser.parse_args()
+
+    segments = [clip.to_segment() for clip in make_clips(args.clips)[0]]
+    audio_bytes = sum(len(segment.raw_data) for segment in segments)
+    print(f'{args.clips} clips, {audio_bytes / MIB:.1f} MiB of samples')
+    with tempfile.TemporaryDirectory() as directory:
+        for clip_format in args.format or cache.CLIP_FORMATS:
+            if clip_format == 'flac' and cache.soundfile is None and shutil.which('ffmpeg') is None:
+                print(f'{clip_format:>5}: skipped (neither soundfile nor ffmpeg found)')
+                continue
+            tts_cache = cache.TTSCache(Path(directory) / clip_format, clip_format=clip_format)
+            start = perf_counter()
+            files = [tts_cache.put(f'{clip_format}{i}', segment) for i, segment in enumerate(segments)]
+            put_elapsed = perf_counter() - start
+            size = sum(Path(file).stat().st_size for file in files)
+            start = perf_counter()
+            for file in files:
+                cache.read_clip(file)
+            elapsed = perf_counter() - start
+            print(f'{clip_format:>5}: {size / MIB:7.1f} MiB on disk ({size / audio_bytes:.0%}), '
+                  f'read {audio_bytes / MIB / elapsed:8.1f} MiB/s ({len(files) / elapsed:.0f} clips/s), '
+                  f'put {len(files) / put_elapsed:.0f} clips/s'
+                  f'{" (soundfile)" if clip_format == "flac" and cache.soundfile else ""}')
+
+
+if __name__ == '__main__':
+    main()
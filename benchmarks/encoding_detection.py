@@ -0,0 +1,67 @@
+"""
+Reading of large subtitle files (`subtitles._read_file`): chardet on the whole file (the previous reader)
+against BOM / strict UTF-8 / chardet on a sample, and against repeated reads (encoding cached by size and mtime).
+
+    python -m benchmarks.encoding_detection [--size-mb 2]
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+from chardet import detect as detect_encoding
+
+from fastdub import subtitles
+
+ENCODINGS = {'utf-8': 'utf-8', 'utf-8 BOM': 'utf-8-sig', 'cp1251': 'cp1251'}
+
+
+def legacy_read_file(filename: str | Path) -> str:
+    """Reader of fastdub 3.8: chardet on the whole file."""
+    with open(filename, 'rb') as file:
+        rawdata = file.read().replace(b'\r\n', b'\n')
+        return rawdata.decode(detect_encoding(rawdata)['encoding'])
+
+
+def make_srt(size: int) -> str:
+    """Mostly ASCII timings with Cyrillic lines (ASCII at the start, as usual)."""
+    lines = []
+    i = length = 0
+    while length < size:
+        i += 1
+        lines.append(f'{i}\n{subtitles.ms_to_srt_time(i * 2000)} --> {subtitles.ms_to_srt_time(i * 2000 + 1500)}\n'
+                     f'{"Hello there" if i < 100 else "Съешь же ещё этих мягких французских булок"}, {i}\n')
+        length += len(lines[-1])
+    return '\n'.join(lines)
+
+
+def _timed(read, filename: Path) -> tuple[float, str]:
+    start = perf_counter()
+    text = read(filename)
+    return perf_counter() - start, text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--size-mb', type=float, default=2.)
+    args = parser.parse_args()
+
+    text = make_srt(int(args.size_mb * 1024 * 1024))
+    with tempfile.TemporaryDirectory() as directory:
+        for name, encoding in ENCODINGS.items():
+            filename = Path(directory) / f'{encoding}.srt'
+            filename.write_bytes(text.encode(encoding))
+            legacy_elapsed, legacy_text = _timed(legacy_read_file, filename)
+            elapsed, tiered_text = _timed(subtitles._read_file, filename)
+            cached_elapsed, cached_text = _timed(subtitles._read_file, filename)
+            if not tiered_text == cached_text == text:
+                raise AssertionError(f'{name} file is decoded wrong')
+            print(f'{name:>9} {filename.stat().st_size / 1024 / 1024:.1f} MiB: whole-file chardet '
+                  f'{legacy_elapsed:7.3f}s{"" if legacy_text == text else " (wrong)"}, '
+                  f'tiered {elapsed:7.3f}s, cached {cached_elapsed:7.3f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Import time of fastdub modules by `python -X importtime` (the best of several runs) and the slowest imports,
+and the wall time of `python -m fastdub --help` (with the voices cache filled).
+Fails if an import writes files (starts a TTS engine or creates the TTS cache).
+
+    python -m benchmarks.import_time [--runs 5] [--top 10]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+MODULES = ('fastdub', 'fastdub.voicer', 'fastdub.dubber', 'fastdub.__main__')
+
+
+def import_times(module: str, env: dict) -> dict[str, int]:
+    """Cumulative import time (us) of every module imported by `import module` in a new interpreter."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            env=env, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line and 'cumulative' not in line:
+            _, cumulative, name = line.removeprefix('import time:').split('|')
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='Slowest imports of fastdub.__main__ to show')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as home:
+        # a fresh home: the voices cache and the TTS cache must not be created by imports
+        python_path = (str(Path(__file__).parents[1]), *filter(None, (os.environ.get('PYTHONPATH'),)))
+        env = {**os.environ, 'HOME': home, 'XDG_CACHE_HOME': home, 'LOCALAPPDATA': home,
+               'PYTHONPATH': os.pathsep.join(python_path)}
+        for module in MODULES:
+            runs = [import_times(module, env) for _ in range(args.runs)]
+            best = {name: min(run.get(name, 0) for run in runs) for name in runs[0]}
+            print(f'{module:>18}: {best[module] / 1000:7.1f} ms')
+        print(f'slowest imports of {MODULES[-1]}:')
+        for name, cumulative in sorted(best.items(), key=lambda item: -item[1])[1:args.top + 1]:
+            print(f'{cumulative / 1000:9.1f} ms  {name}')
+
+        if created := [str(path.relative_to(home)) for path in Path(home).rglob('*')]:
+            print(f'FAIL: importing created {created}')
+            sys.exit(1)
+
+        # the first run fills the voices cache (--voice choices)
+        command = [sys.executable, '-m', 'fastdub', '--help']
+        if (first := subprocess.run(command, env=env, capture_output=True, text=True)).returncode:
+            print(f'python -m fastdub --help: skipped ({first.stderr.strip().splitlines()[-1]})')
+            return
+        elapsed = []
+        for _ in range(args.runs):
+            start = perf_counter()
+            subprocess.run(command, env=env, capture_output=True, check=True)
+            elapsed.append(perf_counter() - start)
+        print(f'python -m fastdub --help: {min(elapsed) * 1000:.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
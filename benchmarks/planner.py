@@ -0,0 +1,44 @@
+"""
+`planner.plan` on synthetic tracks of up to 100k lines: planning time, the maximum speed change
+and the number of sped up lines. Fails if clips overlap or the track does not fit the video.
+
+    python -m benchmarks.planner [--lines 1000 --lines 10000 --lines 100000]
+"""
+from __future__ import annotations
+
+import argparse
+from time import perf_counter
+
+import numpy as np
+
+from fastdub import planner
+
+
+def make_track(count: int, seed: int = 0) -> tuple[np.ndarray, np.ndarray, np.ndarray, float]:
+    """(starts, ends, TTS durations, track end) of dense lines: about a third of clips are longer than their time."""
+    rng = np.random.default_rng(seed)
+    starts = np.cumsum(rng.integers(1000, 4000, count)).astype(np.float64)
+    ends = starts + rng.uniform(0.5, 0.9, count) * np.diff(starts, append=starts[-1] + 3000)
+    durations = (ends - starts) * rng.uniform(0.6, 1.6, count)
+    return starts, ends, durations, ends[-1] + 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--lines', type=int, action='append')
+    args = parser.parse_args()
+
+    for count in args.lines or (1000, 10000, 100000):
+        starts, ends, durations, track_end = make_track(count)
+        start = perf_counter()
+        positions, speeds = planner.plan(starts, ends, durations, track_end)
+        elapsed = perf_counter() - start
+        clip_ends = positions + durations / speeds
+        if np.any(clip_ends[:-1] > positions[1:] + 1e-6) or clip_ends[-1] > track_end + 1e-6:
+            raise AssertionError(f'clips of {count} lines overlap or do not fit the track')
+        print(f'{count:>7} lines: {elapsed:7.3f}s, max speed change {speeds.max():.3f}, '
+              f'{np.count_nonzero(speeds > 1 + 1e-9)} lines sped up')
+
+
+if __name__ == '__main__':
+    main()
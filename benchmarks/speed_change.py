@@ -0,0 +1,64 @@
+"""
+Speed change backends (`audio.SPEED_CHANGE_BACKENDS`): clips per second and output length accuracy.
+
+Clips are synthetic speech-like tones (1-5 s, 22050 Hz mono), speed changes are 1.05-2.
+The length error is the difference of the output from clip duration / speed change.
+Backends that cannot run here (ffmpeg not found) are skipped.
+
+    python -m benchmarks.speed_change [--clips 200] [--backend numpy --backend ffmpeg]
+"""
+from __future__ import annotations
+
+import argparse
+import shutil
+from time import perf_counter
+
+import numpy as np
+
+from fastdub import audio
+
+FRAME_RATE = 22050
+
+
+def make_clips(count: int, seed: int = 0) -> tuple[list[audio.Samples], list[float]]:
+    """Clips with a varying pitch and syllable-like envelope and their speed changes."""
+    rng = np.random.default_rng(seed)
+    clips = []
+    for duration_ms in rng.integers(1000, 5000, count):
+        t = np.arange(duration_ms * FRAME_RATE // 1000) / FRAME_RATE
+        pitch = 120 + 40 * np.sin(2 * np.pi * 0.7 * t)
+        envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t) ** 2
+        wave = np.sin(2 * np.pi * np.cumsum(pitch) / FRAME_RATE) * envelope + 0.05 * rng.standard_normal(t.size)
+        clips.append(audio.Samples((wave * 8000).astype(np.int16)[:, None], FRAME_RATE))
+    return clips, rng.uniform(1.05, 2., count).tolist()
+
+
+def run(backend: str, clips: list[audio.Samples], speeds: list[float]) -> tuple[float, np.ndarray]:
+    """Returns (clips per second, length errors in ms)."""
+    start = perf_counter()
+    results = [audio.speed_change(clip, speed, backend=backend) for clip, speed in zip(clips, speeds)]
+    elapsed = perf_counter() - start
+    errors = np.array([result.duration_ms - clip.duration_ms / speed
+                       for clip, result, speed in zip(clips, results, speeds)])
+    return len(clips) / elapsed, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--clips', type=int, default=200)
+    parser.add_argument('--backend', action='append', choices=audio.SPEED_CHANGE_BACKENDS.keys())
+    args = parser.parse_args()
+
+    clips, speeds = make_clips(args.clips)
+    print(f'{args.clips} clips, {sum(clip.duration_ms for clip in clips) / 1000:.0f}s of audio')
+    for backend in args.backend or audio.SPEED_CHANGE_BACKENDS:
+        if backend == 'ffmpeg' and shutil.which('ffmpeg') is None:
+            print(f'{backend:>8}: skipped (ffmpeg not found)')
+            continue
+        clips_per_second, errors = run(backend, clips, speeds)
+        print(f'{backend:>8}: {clips_per_second:8.1f} clips/s, length error '
+              f'mean {np.abs(errors).mean():.2f} ms, max {np.abs(errors).max():.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Peak memory of dubbing a synthetic 4-hour subtitle file in streaming mode (`Dubber.streaming`) by `Dubber.dub_one`.
+
+Lines are synthesized by a synthetic TTS backend (tones of a length by the text, no TTS engine or ffmpeg needed)
+into a temporary TTS cache, the track is written to a WAV file, peaks are measured by tracemalloc.
+Fails if the peak of 4 hours is not about the peak of 1 hour (memory must not depend on the duration).
+
+    python -m benchmarks.streaming_memory [--hours 4] [--step-ms 4000]
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+
+from fastdub import GlobalSettings, dubber, subtitles, voicer
+from fastdub.audio import AudioSegment
+from fastdub.cache import TTSCache
+
+FRAME_RATE = 22050
+MS_PER_CHAR = 70
+MIB = 1024 * 1024
+
+
+class ToneBackend(voicer.TTSBackend):
+    """A line is a tone of MS_PER_CHAR per character at the default rate."""
+    __slots__ = ()
+    name = 'tone'
+    parallel = True
+
+    def cache_id(self) -> str:
+        return self.name
+
+    def _describe(self) -> dict:
+        return {'voices': [{'id': 'tone', 'name': 'Tone'}], 'defaults': {'voice': 'tone', 'rate': 200, 'volume': 1.}}
+
+    def synthesize_batch(self, jobs, temp_path=None) -> list[AudioSegment]:
+        clips = []
+        for text, _, rate in jobs:
+            t = np.arange(int(len(text) * MS_PER_CHAR * 200 / rate * FRAME_RATE / 1000)) / FRAME_RATE
+            clips.append(AudioSegment((np.sin(2 * np.pi * 220 * t) * 8000).astype(np.int16).tobytes(),
+                                      sample_width=2, frame_rate=FRAME_RATE, channels=1))
+        return clips
+
+
+def _srt(hours: float, step_ms: int) -> str:
+    """Line every step, 3/4 of it long, texts of 20-60 characters (some are sped up)."""
+    return '\n'.join(
+        f'{i}\n{subtitles.ms_to_srt_time(start)} --> {subtitles.ms_to_srt_time(start + step_ms * 3 // 4)}\n'
+        f'line {i:06} {"word " * (i % 9 + 2)}\n'
+        for i, start in enumerate(range(0, int(hours * 3600000), step_ms), 1))
+
+
+def dub_peak(directory: Path, hours: float, step_ms: int) -> tuple[float, int]:
+    """Dubs the subtitles of hours into a track, returns (seconds, peak bytes)."""
+    subs_file = directory / f'{hours:g}h.srt'
+    subs_file.write_text(_srt(hours, step_ms), 'UTF-8')
+    tracemalloc.start()
+    start = perf_counter()
+    dubber.Dubber(None, 'en', 'wav', False, 0., '', streaming=True).dub_one(f'{hours:g}h', None, str(subs_file))
+    elapsed = perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--hours', type=float, default=4.)
+    parser.add_argument('--step-ms', type=int, default=4000, help='Start of a line every step (line is 3/4 of it)')
+    args = parser.parse_args()
+    GlobalSettings.tqdm_kwargs = {**GlobalSettings.tqdm_kwargs, 'disable': True}
+
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        voicer.VOICES_CACHE_FILE = directory / 'voices.json'
+        dubber.VOICER.backend = ToneBackend()
+        dubber.VOICER.cache = TTSCache(directory / 'cache', 10 * 1000 ** 3, 'pcm')
+        peaks = {}
+        for hours in (1., args.hours):
+            elapsed, peaks[hours] = dub_peak(directory, hours, args.step_ms)
+            print(f'{hours:g}h {int(hours * 3600000) // args.step_ms} lines: {elapsed:.1f}s, '
+                  f'peak {peaks[hours] / MIB:.1f} MiB')
+        print(f'an in-memory track of {args.hours:g}h would take '
+              f'{args.hours * 3600 * FRAME_RATE * 2 / MIB:.0f} MiB')
+
+    ok = peaks[args.hours] <= peaks[1.] * 1.5 + 4 * MIB
+    print('memory does not depend on the duration' if ok else 'FAIL: memory grows with the duration')
+    sys.exit(not ok)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+`subtitles.parse` against the previous implementation (tuple concatenation per line and strptime per timestamp)
+on synthetic SRT text of 1k, 10k and 100k lines. Both must give the same lines.
+
+    python -m benchmarks.subtitles_parse [--lines 1000 --lines 10000 --lines 100000]
+"""
+from __future__ import annotations
+
+import argparse
+import datetime
+from time import perf_counter
+
+from fastdub import subtitles
+
+
+def legacy_parse(text: str) -> tuple[tuple[int, int, str], ...]:
+    """Parser of fastdub 3.8 as (start, end, text) of lines."""
+    def calc_ms_label(label: datetime.time) -> int:
+        return int(label.hour * 3600000 + label.minute * 60000 + label.second * 1000 + label.microsecond / 1000)
+
+    lines = ()
+    for i in subtitles.LINE_REGEX.split(f'\n\n{text.lstrip()}')[1:]:
+        times_text: list[str, str] = i.split('\n', 1)
+        line_text = times_text[1].strip()
+        if not line_text:
+            continue
+        start, end = (datetime.time(k.hour, k.minute, k.second, k.microsecond) for k in
+                      [datetime.datetime.strptime(j.replace('.', ','), '%H:%M:%S,%f') for j in
+                       times_text[0].split(' --> ', 1)])
+        lines += (calc_ms_label(start), calc_ms_label(end), line_text),
+    return lines
+
+
+def make_srt(count: int) -> str:
+    """Lines every 0.8 s (strptime of the legacy parser does not take 24 hours and more)."""
+    return '\n'.join(f'{i}\n{subtitles.ms_to_srt_time(i * 800)} --> {subtitles.ms_to_srt_time(i * 800 + 600)}\n'
+                     f'line number {i}\nsecond row\n' for i in range(1, count + 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--lines', type=int, action='append')
+    args = parser.parse_args()
+
+    for count in args.lines or (1000, 10000, 100000):
+        text = make_srt(count)
+        start = perf_counter()
+        lines = subtitles.parse(text)
+        elapsed = perf_counter() - start
+        start = perf_counter()
+        legacy = legacy_parse(text)
+        legacy_elapsed = perf_counter() - start
+        if [(line.ms.start, line.ms.end, line.text) for line in lines] != [*legacy]:
+            raise AssertionError(f'parsers differ on {count} lines')
+        print(f'{count:>7} lines: parse {elapsed:8.3f}s, legacy {legacy_elapsed:8.3f}s '
+              f'({legacy_elapsed / elapsed:.0f}x)')
+
+
+if __name__ == '__main__':
+    main()
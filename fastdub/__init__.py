@@ -85,13 +85,21 @@ _client_secrets.json_
 > python -m fastdub --help
 
 ```
-usage: fastdub [-h] [-rc {0,1,2}] [-ra | --cleanup-audio | -n-ra | --no-cleanup-audio] [-ev | --export-video | -n-ev | --no-export-video]
+usage: fastdub [-h] [-rc {0,1,2}] [-cd CACHE_DIR] [-cs CACHE_SIZE] [-cf {wav,flac,pcm}] [-ra | --cleanup-audio | -n-ra | --no-cleanup-audio] [-ev | --export-video | -n-ev | --no-export-video]
                [-l LANGUAGE] [-ll {CRITICAL,FATAL,ERROR,WARN,WARNING,INFO,DEBUG,NOTSET}] [-tc THREADS_COUNT] -i INPUT [-vf VIDEO_FORMAT]
                [-sf SUBTITLES_FORMAT] [-En EXCLUDE [EXCLUDE ...]] [-Eu EXCLUDE_UNDERSCORE] [-sc | --sidechain | -n-sc | --no-sidechain]
                [-sc-args SIDECHAIN_FFMPEG_PARAMS] [-sc-lvl SIDECHAIN_LEVEL_SC]
-               [-v {...}]
-               [-a ALIGN] [-v-set-a VOICE_SET_ANCHOR] [-fll {trace,debug,verbose,info,warning,error,fatal,panic,quiet}]
-               [-y | --confirm | -n-y | --no-confirm] [-af AUDIO_FORMAT] [-wm WATERMARK] [-tb | --traceback | -n-tb | --no-traceback] [-yt]
+               [-v VOICE]
+               [-a ALIGN] [-scb {numpy,ffmpeg}]
+               [-bsc | --batch-speed-change | -n-bsc | --no-batch-speed-change]
+               [-st | --streaming | -n-st | --no-streaming]
+               [-inc | --incremental | -n-inc | --no-incremental]
+               [-rtc | --rate-control | -n-rtc | --no-rate-control]
+               [-trs TRIM_SILENCE]
+               [-v-set-a VOICE_SET_ANCHOR] [-ttsb {pyttsx3,espeak-ng}] [-tw TTS_WORKERS]
+               [-fll {trace,debug,verbose,info,warning,error,fatal,panic,quiet}]
+               [-y | --confirm | -n-y | --no-confirm] [-af AUDIO_FORMAT] [-wm WATERMARK] [-tb | --traceback | -n-tb | --no-traceback]
+               [-dp | --debug-parts | -n-dp | --no-debug-parts] [-yt]
                [-ak API_KEYS [API_KEYS ...]] [-yts] [-yts-l YOUTUBE_SEARCH_LIMIT] [-yts-rg YOUTUBE_SEARCH_REGION] [-ytu]
                [-ytu-ps {private,public,unlisted}] [-ytu-t] [-tr] [--rewrite-srt | --no-rewrite-srt]
                [-ts {...}]
@@ -101,10 +109,20 @@ fastdub is a tool for dubbing videos by subtitle files.
 optional arguments:
   -h, --help            show this help message and exit
   -rc {0,1,2}, --remove-cache {0,1,2}
-                        Remove all cache (_cached_texts directory) files
-                                0 - No remove cache
+                        Remove all TTS cache files
+                                0 - No remove cache (default)
                                 1 - Delete cache before voice acting
-                                2 - Delete cache after voice acting (default)
+                                2 - Delete cache after voice acting
+  -cd CACHE_DIR, --cache-dir CACHE_DIR
+                        TTS cache directory (default '~/.cache/fastdub/tts')
+  -cs CACHE_SIZE, --cache-size CACHE_SIZE
+                        TTS cache size limit in bytes (k, M, G, T suffixes), least recently used lines are removed
+                        (default 2GB)
+  -cf {wav,flac,pcm}, --cache-format {wav,flac,pcm}
+                        Format of new TTS cache files
+                                wav (default)
+                                flac = lossless compressed (in-process with FastDub[FLAC], else by ffmpeg)
+                                pcm = raw mono 16 bit samples with a small header
   -ra, --cleanup-audio, -n-ra, --no-cleanup-audio
                         Remove result audio if video exists (default True) (default: True)
   -ev, --export-video, -n-ev, --no-export-video
@@ -139,14 +157,36 @@ Audio Ducking:
                         Set sidechain gain. Range is between 0.015625 and 64. (default 0.8)
 
 Voicer:
-  -v {...}, --voice {...}
-                        SAPI voice for voice acting.
+  -v VOICE, --voice VOICE
+                        TTS voice for voice acting (a voice name of the TTS backend).
   -a ALIGN, --align ALIGN
                         Audio fit align (divisor)
                                 1 = right
                                 2 = center (default)
+  -scb {numpy,ffmpeg}, --speed-change-backend {numpy,ffmpeg}
+                        Audio fit speed change backend
+                                numpy = in-process WSOLA time-stretch (default)
+                                ffmpeg = atempo filter
+  -bsc, --batch-speed-change, -n-bsc, --no-batch-speed-change
+                        Change speed of all lines by a single ffmpeg call (ffmpeg backend, not with --streaming) (default: False)
+  -st, --streaming, -n-st, --no-streaming
+                        Write the voice track to disk block by block (memory does not depend on the video duration) (default: False)
+  -inc, --incremental, -n-inc, --no-incremental
+                        Keep the voice track and a manifest in _result, on re-run re-dub only changed lines (default: False)
+  -rtc, --rate-control, -n-rtc, --no-rate-control
+                        Raise the TTS engine rate of lines predicted (by the TTS cache) to be longer than their time,
+                        instead of speeding them up afterwards (default: True)
+  -trs TRIM_SILENCE, --trim-silence TRIM_SILENCE
+                        Cut leading and trailing silence quieter than this dBFS from synthesized lines (default -50, 0 to keep it)
   -v-set-a VOICE_SET_ANCHOR, --voice-set-anchor VOICE_SET_ANCHOR
                         Anchor indicating voice actor change (default "!:")
+  -ttsb {pyttsx3,espeak-ng}, --tts-backend {pyttsx3,espeak-ng}
+                        Speech synthesizer
+                                pyttsx3 = SAPI5, NSSS or espeak engine (default)
+                                espeak-ng = libespeak-ng in worker processes (--tts-workers)
+  -tw TTS_WORKERS, --tts-workers TTS_WORKERS
+                        Process count to synthesize speech (default 1, < 2 to disable)
+                                *N = N * cpu count
 
 FFmpeg Output:
   -fll {trace,debug,verbose,info,warning,error,fatal,panic,quiet}, --ffmpeg-loglevel {trace,debug,verbose,info,warning,error,fatal,panic,quiet}
@@ -161,6 +201,8 @@ FFmpeg Output:
 Terminal Output:
   -tb, --traceback, -n-tb, --no-traceback
                         Show debug traceback (default: False)
+  -dp, --debug-parts, -n-dp, --no-debug-parts
+                        Export every fitted line to _result/_working_dir (default: False)
 
 YouTube:
   -yt, --youtube
@@ -242,6 +284,7 @@ class GlobalSettings:
     language = 'ru'
     watermark = ''
     tqdm_kwargs = {'dynamic_ncols': True}
+    speed_change_backend = 'numpy'
 
 
 class PrettyViewPrefix:
@@ -11,12 +11,11 @@ from time import perf_counter
 import rich.traceback
 
 import fastdub.youtube
-from fastdub import GlobalSettings, PrettyViewPrefix, dubber, translator, voicer, youtube
+from fastdub import GlobalSettings, PrettyViewPrefix, audio, cache, dubber, translator, voicer, youtube
 from fastdub.ffmpeg_wrapper import DefaultFFmpegParams
 from fastdub.translator.subs_translate import SrtTranslate
 
 __all__ = ('parse_args', 'main')
-THREADS_MAY_NEED = youtube.SUPPORTED or translator.SUPPORTED
 
 if hasattr(logging, '_nameToLevel'):
     def _get_logging_level_names() -> tuple[str]:
@@ -57,17 +56,36 @@ def _thread_count_type(tc: str) -> int:
     return int(cpu_count() * float(tc.removeprefix('*'))) if tc.startswith('*') else int(tc)
 
 
+_SIZE_PREFIXES = {'k': 1000, 'm': 1000 ** 2, 'g': 1000 ** 3, 't': 1000 ** 4}
+
+
+def _size_type(size: str) -> int:
+    size = size.strip().casefold().removesuffix('b')
+    return int(float(size[:-1]) * _SIZE_PREFIXES[size[-1]]) if size[-1:] in _SIZE_PREFIXES else int(size)
+
+
 # noinspection PyTypeChecker
 def parse_args() -> argparse.Namespace:
     arg_parser = argparse.ArgumentParser('fastdub',
                                          description='fastdub is a tool for dubbing videos by subtitle files.',
                                          formatter_class=argparse.RawTextHelpFormatter)
 
-    arg_parser.add_argument('-rc', '--remove-cache', default=2, type=int, choices=(0, 1, 2),
-                            help='Remove all cache (_cached_texts directory) files\n'
-                                 '\t0 - No remove cache\n'
+    arg_parser.add_argument('-rc', '--remove-cache', default=0, type=int, choices=(0, 1, 2),
+                            help='Remove all TTS cache files\n'
+                                 '\t0 - No remove cache (default)\n'
                                  '\t1 - Delete cache before voice acting\n'
-                                 '\t2 - Delete cache after voice acting (default)')
+                                 '\t2 - Delete cache after voice acting')
+    arg_parser.add_argument('-cd', '--cache-dir', default=str(cache.DEFAULT_CACHE_DIR),
+                            help=f'TTS cache directory (default {str(cache.DEFAULT_CACHE_DIR)!r})')
+    arg_parser.add_argument('-cs', '--cache-size', default=cache.DEFAULT_CACHE_SIZE, type=_size_type,
+                            help='TTS cache size limit in bytes (k, M, G, T suffixes), '
+                                 'least recently used lines are removed\n'
+                                 f'(default {PrettyViewPrefix.from_bytes(cache.DEFAULT_CACHE_SIZE)})')
+    arg_parser.add_argument('-cf', '--cache-format', default='wav', choices=cache.CLIP_FORMATS,
+                            help='Format of new TTS cache files\n'
+                                 '\twav (default)\n'
+                                 '\tflac = lossless compressed (in-process with FastDub[FLAC], else by ffmpeg)\n'
+                                 '\tpcm = raw mono 16 bit samples with a small header')
     arg_parser.add_argument('-ra', '--cleanup-audio', action=BooleanOptionalAction, default=True,
                             help='Remove result audio if video exists (default True)')
     arg_parser.add_argument('-ev', '--export-video', action=BooleanOptionalAction, default=True)
@@ -77,11 +95,12 @@ def parse_args() -> argparse.Namespace:
                             choices=_get_logging_level_names(),
                             help='Program log level')
 
-    if THREADS_MAY_NEED:
-        arg_parser.add_argument('-tc', '--threads-count', default=cpu_count(),
-                                type=_thread_count_type,
-                                help='Process count to download (pass to cpu count, < 2 to disable)\n'
-                                     '\t*N = N * cpu count')
+    arg_parser.add_argument('-tc', '--threads-count', default=cpu_count(),
+                            type=_thread_count_type,
+                            help='Process count to download, translate and dub files'
+                                 ' (pass to cpu count, < 2 to disable)\n'
+                                 '\t*N = N * cpu count\n'
+                                 'Dubbing is also limited by free RAM and disk space')
 
     input_group = arg_parser.add_argument_group('Input')
     input_group.add_argument('-i', '--input', default=getcwd(), required=True,
@@ -106,14 +125,42 @@ def parse_args() -> argparse.Namespace:
                                help='Set sidechain gain. Range is between 0.015625 and 64. (default 0.8)')
 
     voicer_group = arg_parser.add_argument_group('Voicer')
-    voicer_group.add_argument('-v', '--voice', type=str.lower, choices=voicer.VOICES_NAMES.keys(),
-                              help='SAPI voice for voice acting.')
+    voicer_group.add_argument('-v', '--voice', type=str.lower,
+                              help='TTS voice for voice acting (a voice name of the TTS backend).')
     voicer_group.add_argument('-a', '--align', default=2., type=float,
                               help='Audio fit align (divisor)'
                                    '\n\t1 = right'
                                    '\n\t2 = center (default)')
+    voicer_group.add_argument('-scb', '--speed-change-backend', default=GlobalSettings.speed_change_backend,
+                              choices=audio.SPEED_CHANGE_BACKENDS.keys(),
+                              help='Audio fit speed change backend'
+                                   '\n\tnumpy = in-process WSOLA time-stretch (default)'
+                                   '\n\tffmpeg = atempo filter')
+    voicer_group.add_argument('-bsc', '--batch-speed-change', action=BooleanOptionalAction, default=False,
+                              help='Change speed of all lines by a single ffmpeg call '
+                                   '(ffmpeg backend, not with --streaming)')
+    voicer_group.add_argument('-st', '--streaming', action=BooleanOptionalAction, default=False,
+                              help='Write the voice track to disk block by block '
+                                   '(memory does not depend on the video duration)')
+    voicer_group.add_argument('-inc', '--incremental', action=BooleanOptionalAction, default=False,
+                              help='Keep the voice track and a manifest in _result, '
+                                   'on re-run re-dub only changed lines')
+    voicer_group.add_argument('-rtc', '--rate-control', action=BooleanOptionalAction, default=True,
+                              help='Raise the TTS engine rate of lines predicted (by the TTS cache) '
+                                   'to be longer than their time, instead of speeding them up afterwards')
+    voicer_group.add_argument('-trs', '--trim-silence', type=float, default=audio.TRIM_SILENCE_DBFS,
+                              help='Cut leading and trailing silence quieter than this dBFS from synthesized lines '
+                                   f'(default {audio.TRIM_SILENCE_DBFS:g}, 0 to keep it)')
     voicer_group.add_argument('-v-set-a', '--voice-set-anchor', default='!:',
                               help='Anchor indicating voice actor change (default "!:")')
+    voicer_group.add_argument('-ttsb', '--tts-backend', default=voicer.Pyttsx3Backend.name,
+                              choices=voicer.TTS_BACKENDS.keys(),
+                              help='Speech synthesizer'
+                                   '\n\tpyttsx3 = SAPI5, NSSS or espeak engine (default)'
+                                   '\n\tespeak-ng = libespeak-ng in worker processes (--tts-workers)')
+    voicer_group.add_argument('-tw', '--tts-workers', default=1, type=_thread_count_type,
+                              help='Process count to synthesize speech (default 1, < 2 to disable)\n'
+                                   '\t*N = N * cpu count')
 
     ffmpeg_group = arg_parser.add_argument_group('FFmpeg Output')
     ffmpeg_group.add_argument('-fll', '--ffmpeg-loglevel', default='panic',
@@ -130,6 +177,8 @@ def parse_args() -> argparse.Namespace:
     output_group = arg_parser.add_argument_group('Terminal Output')
     output_group.add_argument('-tb', '--traceback', action=BooleanOptionalAction, default=False,
                               help='Show debug traceback')
+    output_group.add_argument('-dp', '--debug-parts', action=BooleanOptionalAction, default=False,
+                              help='Export every fitted line to _result/_working_dir')
 
     if youtube.SUPPORTED:
         yt_group = arg_parser.add_argument_group('YouTube')
@@ -169,7 +218,13 @@ def parse_args() -> argparse.Namespace:
                                      default='google',
                                      choices=translator.SERVICES,
                                      help='Subtitle translation service. (default google)')
-    return arg_parser.parse_args()
+    args = arg_parser.parse_args()
+    # voices of the chosen backend (the voices cache, refreshed if the voice was installed after it was written)
+    if args.voice and args.voice not in voicer.voice_names(args.tts_backend) and args.voice not in (
+            voices := voicer.voice_names(args.tts_backend, True)):
+        arg_parser.error(f'argument -v/--voice: invalid choice: {args.voice!r} '
+                         f'(choose from {", ".join(map(repr, voices))})')
+    return args
 
 
 def banner():
@@ -187,11 +242,16 @@ def main():
     logging.basicConfig(format='%(levelname)s: [%(asctime)s] %(message)s')
     logging.getLogger().setLevel(args.loglevel)
 
+    dubber.VOICER.cache = cache.TTSCache(args.cache_dir, args.cache_size, args.cache_format)
+    if not isinstance(dubber.VOICER.backend, tts_backend := voicer.TTS_BACKENDS[args.tts_backend]):
+        dubber.VOICER.backend = tts_backend(args.tts_workers) if tts_backend.parallel else tts_backend()
+    dubber.VOICER.trim_silence = args.trim_silence or None
     remove_cache = args.remove_cache
     if remove_cache == 1:
         dubber.VOICER.cleanup()
 
     GlobalSettings.watermark = args.watermark
+    GlobalSettings.speed_change_backend = args.speed_change_backend
     DefaultFFmpegParams.ffmpeg_log_level = args.ffmpeg_loglevel
 
     total_time = 0
@@ -199,8 +259,7 @@ def main():
         DefaultFFmpegParams.args += '-y',
         total_time = perf_counter()
 
-    if THREADS_MAY_NEED:
-        GlobalSettings.threads_count = args.threads_count
+    GlobalSettings.threads_count = args.threads_count
 
     if youtube.SUPPORTED and args.youtube:
         query: str = args.input
@@ -227,14 +286,20 @@ def main():
     else:
         translate_service = None
 
-    dubber.Dubber(args.voice, args.language, audio_format,
-                  args.sidechain, args.sidechain_level_sc, args.sidechain_ffmpeg_params,
-                  args.align,
-                  args.cleanup_audio, args.export_video
-                  ).dub_dir(videos, video_format, subtitles_format)
-
+    try:
+        dubber.Dubber(args.voice, args.language, audio_format,
+                      args.sidechain, args.sidechain_level_sc, args.sidechain_ffmpeg_params,
+                      args.align,
+                      args.cleanup_audio, args.export_video,
+                      args.tts_workers, args.debug_parts, args.batch_speed_change,
+                      args.threads_count, args.streaming, args.incremental, args.rate_control
+                      ).dub_dir(videos, video_format, subtitles_format)
+    finally:
+        dubber.VOICER.backend.close()
+
+    logging.info(dubber.VOICER.cache.report())
     if remove_cache == 2:
-        voicer.Voicer().cleanup()
+        dubber.VOICER.cleanup()
 
     if fastdub.youtube.yt_upload.SUPPORTED and args.youtube_upload:
         fastdub.youtube.yt_upload.uploader.Uploader(args.privacy_status,
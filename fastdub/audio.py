@@ -2,16 +2,28 @@ from __future__ import annotations
 
 import math
 import os.path
+import wave
 from copy import copy
 from tempfile import TemporaryDirectory
+from typing import Sequence
 
-import pydub.silence
+import numpy as np
+import pydub
 
+from fastdub import GlobalSettings
 from fastdub.ffmpeg_wrapper import FFmpegWrapper
 
-__all__ = ('AudioSegment',
-           'speed_change', 'calc_speed_change_ffmpeg_arg',
-           'fit')
+__all__ = ('AudioSegment', 'Samples', 'AudioBuilder', 'TrackBuffer', 'TrackWriter', 'TrackPatcher',
+           'wav_duration_ms', 'to_numpy',
+           'SPEED_CHANGE_BACKENDS', 'speed_change', 'speed_change_many',
+           'calc_speed_change_ffmpeg_arg', 'calc_speed_change_filter_graph',
+           'time_stretch', 'trim_silence',
+           'fit', 'fit_offset', 'fit_speed', 'fit_silence')
+
+# leading and trailing silence of TTS clips (see `trim_silence`)
+TRIM_SILENCE_DBFS = -50.
+TRIM_MARGIN_MS = 30.
+TRIM_BLOCK_MS = 10.
 
 
 class AudioSegment(pydub.AudioSegment):
@@ -30,21 +42,454 @@ class AudioSegment(pydub.AudioSegment):
     __add__ = append
 
 
-def speed_change(audio: AudioSegment, speed_changes: float, allow_copy: bool = True, log_level: str = 'error'
-                 ) -> AudioSegment:
+class Samples:
+    """
+    Audio as a (frames, channels) NumPy array of signed integer samples with its frame rate.
+    Slices (by ms, like pydub) are views, gain and mixing change the samples in place
+    (read-only samples, e.g. a view of a pydub segment, are copied once on the first change).
+    Has the format attributes of pydub segments (frame_rate, sample_width, channels, frame_count, raw_data),
+    so tracks and `AudioBuilder` take it as is. pydub is used only by `Samples.from_segment`,
+    `Samples.to_segment` and format conversion (`Samples.converted`).
+    """
+    __slots__ = ('data', 'frame_rate')
+
+    def __init__(self, data: np.ndarray, frame_rate: int):
+        self.data = data
+        self.frame_rate = frame_rate
+
+    @classmethod
+    def from_segment(cls, segment: pydub.AudioSegment) -> Samples:
+        """View of the samples of the segment (no copy, see `to_numpy`)."""
+        return cls(to_numpy(segment), segment.frame_rate)
+
+    @classmethod
+    def silent(cls, duration_ms: float, frame_rate: int, sample_width: int = 2, channels: int = 1) -> Samples:
+        return cls(np.zeros((max(0, int(duration_ms * frame_rate / 1000.)), channels), f'<i{sample_width}'),
+                   frame_rate)
+
+    def to_segment(self) -> AudioSegment:
+        """pydub segment of the samples (copies them into bytes)."""
+        return AudioSegment(data=self.data.tobytes(), sample_width=self.sample_width, frame_rate=self.frame_rate,
+                            channels=self.channels)
+
+    @property
+    def sample_width(self) -> int:
+        return self.data.itemsize
+
+    @property
+    def channels(self) -> int:
+        return self.data.shape[1]
+
+    @property
+    def duration_ms(self) -> float:
+        return len(self.data) * 1000. / self.frame_rate
+
+    @property
+    def raw_data(self) -> memoryview:
+        """Bytes of the samples (a view unless they are a strided view themselves)."""
+        return memoryview(np.ascontiguousarray(self.data)).cast('B')
+
+    def frame_count(self) -> int:
+        return len(self.data)
+
+    def _frame(self, ms: float | None, default: int) -> int:
+        return default if ms is None else int(ms * self.frame_rate / 1000.)
+
+    def __getitem__(self, item: slice) -> Samples:
+        """View of [start ms, stop ms)."""
+        if not isinstance(item, slice) or item.step is not None:
+            raise TypeError('Samples are sliced by [start_ms:stop_ms]')
+        return Samples(self.data[self._frame(item.start, 0):self._frame(item.stop, len(self.data))], self.frame_rate)
+
+    def __copy__(self) -> Samples:
+        return Samples(self.data.copy(), self.frame_rate)
+
+    def _writable(self):
+        if not self.data.flags.writeable:
+            self.data = self.data.copy()
+
+    def _store(self, target: np.ndarray, values: np.ndarray):
+        limits = np.iinfo(self.data.dtype)
+        np.clip(values, limits.min, limits.max, out=values)
+        target[...] = values
+
+    def apply_gain(self, gain_db: float) -> Samples:
+        """Changes volume in place (saturating)."""
+        self._writable()
+        self._store(self.data, np.rint(self.data * 10. ** (gain_db / 20.)))
+        return self
+
+    def overlay(self, other: Samples | pydub.AudioSegment, position_ms: float = 0.) -> Samples:
+        """Mixes other audio into the samples in place (saturating) from position_ms, its excess is dropped."""
+        if not isinstance(other, Samples):
+            other = Samples.from_segment(other)
+        other = other.converted(self.frame_rate, self.sample_width, self.channels)
+        self._writable()
+        target = self.data[self._frame(position_ms, 0):]
+        target = target[:len(other.data)]
+        self._store(target, target.astype(np.int64) + other.data[:len(target)])
+        return self
+
+    def converted(self, frame_rate: int, sample_width: int, channels: int) -> Samples:
+        """Samples of the format (themselves if they have it, converted by pydub otherwise)."""
+        if (frame_rate, sample_width, channels) == (self.frame_rate, self.sample_width, self.channels):
+            return self
+        return Samples.from_segment(self.to_segment().set_frame_rate(frame_rate).set_sample_width(sample_width)
+                                    .set_channels(channels))
+
+
+def _like(audio: pydub.AudioSegment | Samples, result: pydub.AudioSegment | Samples) -> pydub.AudioSegment | Samples:
+    """result as `Samples` or a pydub segment, as audio."""
+    if isinstance(audio, Samples):
+        return result if isinstance(result, Samples) else Samples.from_segment(result)
+    return result.to_segment() if isinstance(result, Samples) else result
+
+
+class _Track:
+    """PCM track, the PCM format is taken from the first non-empty placed clip."""
+    __slots__ = ('frame_rate', 'sample_width', 'channels')
+
+    def __init__(self):
+        self.frame_rate = self.sample_width = self.channels = None
+
+    def _to_bytes(self, ms: float) -> int:
+        return int(ms * self.frame_rate / 1000.) * self.sample_width * self.channels
+
+    def _adopt(self, audio: pydub.AudioSegment | Samples) -> pydub.AudioSegment | Samples:
+        """Takes the format of the first clip, converts the others to it."""
+        if self.frame_rate is None:
+            self.frame_rate, self.sample_width, self.channels = audio.frame_rate, audio.sample_width, audio.channels
+            self._on_format()
+            return audio
+        if isinstance(audio, Samples):
+            return audio.converted(self.frame_rate, self.sample_width, self.channels)
+        return audio.set_frame_rate(self.frame_rate).set_sample_width(self.sample_width).set_channels(self.channels)
+
+    def _on_format(self):
+        pass
+
+    def place(self, audio: pydub.AudioSegment | Samples, position_ms: float):
+        raise NotImplementedError
+
+
+class AudioBuilder(_Track):
+    """
+    Audio built from clips and silence in a growable buffer, copying every byte once (amortized).
+    The format is fixed once (given or taken from the first clip), silence does not allocate audio
+    and `AudioBuilder.build` hands the buffer to the audio without copying it.
+    """
+    __slots__ = ('_data', '_end', '_leading_ms')
+
+    def __init__(self, frame_rate: int = None, sample_width: int = None, channels: int = None):
+        super().__init__()
+        self._data = bytearray()
+        self._end = 0
+        # silence appended before the format is known
+        self._leading_ms = 0.
+        if frame_rate is not None:
+            self.frame_rate, self.sample_width, self.channels = frame_rate, sample_width, channels
+            self._on_format()
+
+    def _on_format(self):
+        if self._leading_ms:
+            self.append_silence(self._leading_ms)
+            self._leading_ms = 0.
+
+    def _reserve(self, size: int):
+        """Grows the buffer (at least doubling it) to size bytes, new bytes are silence."""
+        if size > len(self._data):
+            self._data.extend(bytes(max(size, 2 * len(self._data)) - len(self._data)))
+
+    def _write(self, start: int, data: bytes):
+        end = start + len(data)
+        self._reserve(end)
+        self._data[start:end] = data
+        self._end = max(self._end, end)
+
+    def frame_count(self) -> int:
+        if self.frame_rate is None:
+            return 0
+        return self._end // (self.sample_width * self.channels)
+
+    def append(self, audio: pydub.AudioSegment | Samples) -> AudioBuilder:
+        if audio.frame_count():
+            data = self._adopt(audio).raw_data
+            self._write(self._end, data)
+        return self
+
+    def append_silence(self, duration_ms: float) -> AudioBuilder:
+        if self.frame_rate is None:
+            self._leading_ms += max(duration_ms, 0.)
+        elif (size := self._to_bytes(duration_ms)) > 0:
+            self._reserve(self._end + size)
+            self._end += size
+        return self
+
+    def place(self, audio: pydub.AudioSegment | Samples, position_ms: float):
+        """Copies the clip to its offset (over the clips placed there), the audio is extended if needed."""
+        if not audio.frame_count():
+            return
+        data = self._adopt(audio).raw_data
+        self._write(self._to_bytes(position_ms), data)
+
+    def build(self) -> AudioSegment:
+        """Audio from the beginning to the end of the last clip or silence, the builder is emptied."""
+        if self.frame_rate is None:
+            self._leading_ms = 0.
+            return AudioSegment.silent(0)
+        data = self._data
+        del data[self._end:]
+        self._data = bytearray()
+        self._end = 0
+        return AudioSegment(data=data, sample_width=self.sample_width, frame_rate=self.frame_rate,
+                            channels=self.channels)
+
+
+class TrackBuffer(AudioBuilder):
+    """
+    PCM buffer of the whole track, preallocated when the format is known.
+    Clips are copied straight to their offsets.
+    """
+    __slots__ = ('duration_ms',)
+
+    def __init__(self, duration_ms: float):
+        self.duration_ms = duration_ms
+        super().__init__()
+
+    def _on_format(self):
+        self._reserve(self._to_bytes(self.duration_ms))
+        super()._on_format()
+
+    def to_segment(self) -> AudioSegment:
+        """Track from the beginning to the end of the last placed clip (see `AudioBuilder.build`)."""
+        return self.build()
+
+
+class TrackWriter(_Track):
+    """
+    Writes the track to a WAV file block by block, memory does not depend on the track duration.
+    Clips must be placed in order, the beginning of a clip overlapping the previous one is dropped.
+    """
+    __slots__ = ('_file', '_end', '_silence')
+
+    def __init__(self, file: str | os.PathLike):
+        super().__init__()
+        self._file = wave.open(str(file), 'wb')
+        self._end = 0
+        self._silence = b''
+
+    def _on_format(self):
+        self._silence = bytes(self.sample_width * self.channels * 65536)
+        self._file.setnchannels(self.channels)
+        self._file.setsampwidth(self.sample_width)
+        self._file.setframerate(self.frame_rate)
+
+    def place(self, audio: pydub.AudioSegment | Samples, position_ms: float):
+        if not audio.frame_count():
+            return
+        data = self._adopt(audio).raw_data
+        start = self._to_bytes(position_ms)
+        if start < self._end:
+            data = data[self._end - start:]
+        while start > self._end:
+            self._file.writeframesraw(self._silence[:start - self._end])
+            self._end += min(start - self._end, len(self._silence))
+        self._file.writeframesraw(data)
+        self._end += len(data)
+
+    def close(self):
+        if self.frame_rate is None:
+            self.frame_rate, self.sample_width, self.channels = 22050, 2, 1
+            self._on_format()
+        self._file.close()
+
+    def __enter__(self) -> TrackWriter:
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+class TrackPatcher(_Track):
+    """Places clips to an existing WAV track in place (the format and the length of the track are kept)."""
+    __slots__ = ('duration_ms', '_file', '_data_offset', '_data_size')
+
+    def __init__(self, file: str | os.PathLike):
+        super().__init__()
+        with wave.open(str(file)) as f:
+            self.frame_rate, self.sample_width, self.channels = f.getframerate(), f.getsampwidth(), f.getnchannels()
+            self.duration_ms = f.getnframes() * 1000. / self.frame_rate
+        self._data_size = self._to_bytes(self.duration_ms)
+        self._file = open(file, 'r+b')
+        self._data_offset = self._find_data_chunk()
+
+    def _find_data_chunk(self) -> int:
+        self._file.seek(12)
+        while len(header := self._file.read(8)) == 8:
+            size = int.from_bytes(header[4:], 'little')
+            if header[:4] == b'data':
+                return self._file.tell()
+            self._file.seek(size + size % 2, os.SEEK_CUR)
+        raise wave.Error('data chunk not found')
+
+    def _write(self, start: int, data: bytes):
+        if start >= self._data_size:
+            return
+        self._file.seek(self._data_offset + start)
+        self._file.write(data[:self._data_size - start])
+
+    def place(self, audio: pydub.AudioSegment | Samples, position_ms: float):
+        if audio.frame_count():
+            self._write(self._to_bytes(position_ms), self._adopt(audio).raw_data)
+
+    def clear(self, position_ms: float, duration_ms: float):
+        """Fills with silence."""
+        self._write(start := self._to_bytes(position_ms), bytes(self._to_bytes(position_ms + duration_ms) - start))
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self) -> TrackPatcher:
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+def speed_change(audio: AudioSegment | Samples, speed_changes: float, allow_copy: bool = True,
+                 log_level: str = 'error', backend: str = None) -> AudioSegment | Samples:
+    """
+    Changes audio speed without changing pitch.
+    backend is one of SPEED_CHANGE_BACKENDS (default GlobalSettings.speed_change_backend),
+    backends change `Samples`, the result is of the type of audio.
+    """
     if speed_changes <= 0:
         raise ValueError(f"Speed cannot be negative ({speed_changes}).\n"
                          "This is usually due to errors in subtitle timecodes.")
     if speed_changes == 1:
         return audio if allow_copy else copy(audio)
+    if backend is None:
+        backend = GlobalSettings.speed_change_backend
+    try:
+        speed_change_backend = SPEED_CHANGE_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f'{backend!r} not in {(*SPEED_CHANGE_BACKENDS,)}') from None
+    samples = audio if isinstance(audio, Samples) else Samples.from_segment(audio)
+    return _like(audio, speed_change_backend(samples, speed_changes, log_level))
+
+
+def _speed_change_ffmpeg(samples: Samples, speed_changes: float, log_level: str = 'error') -> Samples:
     with TemporaryDirectory() as tmp:
         inp = os.path.join(tmp, 'inp.wav')
-        audio.export(inp)
+        samples.to_segment().export(inp)
         out = os.path.join(tmp, 'out.wav')
         FFmpegWrapper.convert('-i', inp,
                               '-af', calc_speed_change_ffmpeg_arg(speed_changes),
                               out, loglevel=log_level)
-        return AudioSegment.from_file(out)
+        return Samples.from_segment(AudioSegment.from_file(out))
+
+
+def _speed_change_numpy(samples: Samples, speed_changes: float, log_level: str = 'error') -> Samples:
+    if samples.sample_width not in {2, 4}:
+        return _speed_change_ffmpeg(samples, speed_changes, log_level)
+    dtype = samples.data.dtype
+    stretched = time_stretch(samples.data.astype(np.float32 if samples.sample_width == 2 else np.float64),
+                             speed_changes, samples.frame_rate)
+    limits = np.iinfo(dtype)
+    return Samples(np.clip(np.rint(stretched, out=stretched), limits.min, limits.max, out=stretched).astype(dtype),
+                   samples.frame_rate)
+
+
+SPEED_CHANGE_BACKENDS = {'numpy': _speed_change_numpy, 'ffmpeg': _speed_change_ffmpeg}
+
+
+def speed_change_many(audios: Sequence[AudioSegment | Samples], speed_changes: Sequence[float],
+                      log_level: str = 'error', backend: str = None) -> list[AudioSegment | Samples]:
+    """
+    `speed_change` for many audios.
+    With the ffmpeg backend all of them are stretched by a single ffmpeg call (see `calc_speed_change_filter_graph`).
+    """
+    if backend is None:
+        backend = GlobalSettings.speed_change_backend
+    result = [*audios]
+    changes = [(i, audio, speed) for i, (audio, speed) in enumerate(zip(audios, speed_changes)) if speed != 1]
+    if backend != 'ffmpeg' or len(changes) < 2:
+        for i, audio, speed in changes:
+            result[i] = speed_change(audio, speed, log_level=log_level, backend=backend)
+        return result
+    if any(speed <= 0 for *_, speed in changes):
+        raise ValueError("Speed cannot be negative.\n"
+                         "This is usually due to errors in subtitle timecodes.")
+
+    sample = changes[0][1]
+    builder = AudioBuilder(sample.frame_rate, sample.sample_width, sample.channels)
+    bounds = []
+    out_frames = []
+    for _, audio, speed in changes:
+        start = builder.frame_count()
+        builder.append(audio)
+        bounds.append((start, builder.frame_count()))
+        out_frames.append(round((bounds[-1][1] - start) / speed))
+    with TemporaryDirectory() as tmp:
+        inp = os.path.join(tmp, 'inp.wav')
+        builder.build().export(inp)
+        graph = os.path.join(tmp, 'graph.txt')
+        with open(graph, 'w') as f:
+            f.write(calc_speed_change_filter_graph(bounds, [speed for *_, speed in changes], out_frames))
+        out = os.path.join(tmp, 'out.wav')
+        FFmpegWrapper.convert('-i', inp, '-filter_complex_script', graph, '-map', '[out]', out, loglevel=log_level)
+        stretched = Samples.from_segment(AudioSegment.from_file(out))
+    position = 0
+    for (i, audio, _), frames in zip(changes, out_frames):
+        result[i] = _like(audio, Samples(stretched.data[position:position + frames], stretched.frame_rate))
+        position += frames
+    return result
+
+
+def calc_speed_change_filter_graph(bounds: Sequence[tuple[int, int]], speed_changes: Sequence[float],
+                                   out_frames: Sequence[int]) -> str:
+    """
+    FFmpeg filter graph which cuts [start, end) frames segments from the single input,
+    changes their speed (see `calc_speed_change_ffmpeg_arg`), pads/trims each result to exactly out_frames
+    and concatenates them into [out].
+    """
+    count = len(bounds)
+    return ''.join((
+        f'[0:a]asplit={count}', *(f'[i{k}]' for k in range(count)), ';',
+        *(f'[i{k}]atrim=start_sample={start}:end_sample={end},asetpts=PTS-STARTPTS,'
+          f'{calc_speed_change_ffmpeg_arg(speed)},apad=whole_len={frames},atrim=end_sample={frames}[o{k}];'
+          for k, ((start, end), speed, frames) in enumerate(zip(bounds, speed_changes, out_frames))),
+        *(f'[o{k}]' for k in range(count)), f'concat=n={count}:v=0:a=1[out]'))
+
+
+def time_stretch(samples: np.ndarray, speed_changes: float, frame_rate: int, frame_ms: float = 20.) -> np.ndarray:
+    """
+    WSOLA time-stretch of (frames, channels) samples.
+    Returns round(len(samples) / speed_changes) frames of the same dtype kind (float).
+    """
+    out_len = round(len(samples) / speed_changes)
+    frame = max(2, int(frame_rate * frame_ms / 1000.)) // 2 * 2
+    hop = frame // 2
+    tolerance = hop // 2
+    step = max(1, frame_rate // 8000)
+    window = (.5 - .5 * np.cos(2. * np.pi * np.arange(frame) / frame)).astype(samples.dtype)[:, None]
+
+    frames_count = out_len // hop + 2
+    padded = np.pad(samples, ((tolerance, int(hop * speed_changes) + 2 * (frame + tolerance)), (0, 0)))
+    mono = padded.mean(axis=1)
+    out = np.zeros((frames_count * hop + frame, samples.shape[1]), samples.dtype)
+
+    previous = tolerance
+    for k in range(frames_count):
+        nominal = tolerance + int(k * hop * speed_changes)
+        position = nominal
+        if k:
+            natural = mono[previous + hop:previous + hop + frame:step]
+            region = mono[nominal - tolerance:nominal + tolerance + frame:step]
+            position += int(np.correlate(region, natural, 'valid').argmax()) * step - tolerance
+        out[k * hop:k * hop + frame] += padded[position:position + frame] * window
+        previous = position
+    return out[:out_len]
 
 
 def calc_speed_change_ffmpeg_arg(speed_changes: float) -> str:
@@ -60,14 +505,77 @@ def calc_speed_change_ffmpeg_arg(speed_changes: float) -> str:
     return (f'atempo={speed_changes}^(1/{power}),' * power)[:-1]
 
 
-def fit(audio: AudioSegment,
+def to_numpy(audio: pydub.AudioSegment) -> np.ndarray:
+    """
+    Samples of audio as (frames, channels) array of little-endian signed integers (no copy).
+    The array is read-only: the data of a segment may be a mutable buffer (see `AudioBuilder.build`).
+    """
+    samples = np.frombuffer(audio.raw_data, f'<i{audio.sample_width}').reshape(-1, audio.channels)
+    samples.flags.writeable = False
+    return samples
+
+
+def trim_silence(audio: AudioSegment, threshold_dbfs: float = TRIM_SILENCE_DBFS,
+                 margin_ms: float = TRIM_MARGIN_MS, block_ms: float = TRIM_BLOCK_MS) -> AudioSegment:
+    """
+    Cuts leading and trailing silence: blocks of block_ms whose RMS is below threshold_dbfs,
+    margin_ms of it is kept around the sound. Returns the audio itself if there is nothing to cut
+    (or no block is louder than the threshold).
+    """
+    samples = to_numpy(audio)
+    if not len(samples):
+        return audio
+    block = max(1, round(audio.frame_rate * block_ms / 1000.))
+    starts = np.arange(0, len(samples), block)
+    squares = np.add.reduceat(np.square(samples, dtype=np.float64).sum(axis=1), starts)
+    rms = np.sqrt(squares / (np.minimum(block, len(samples) - starts) * audio.channels))
+    loud = np.flatnonzero(rms >= audio.max_possible_amplitude * 10. ** (threshold_dbfs / 20.))
+    if not len(loud):
+        return audio
+    margin = round(audio.frame_rate * margin_ms / 1000.)
+    start = max(0, int(starts[loud[0]]) - margin)
+    end = min(len(samples), int(starts[loud[-1]]) + block + margin)
+    if not start and end == len(samples):
+        return audio
+    # noinspection PyProtectedMember
+    return audio._spawn(audio.raw_data[start * audio.frame_width:end * audio.frame_width])
+
+
+def wav_duration_ms(file: str | os.PathLike) -> float:
+    """Duration of WAV file by its header (the file is decoded only if the header is not supported)."""
+    try:
+        with wave.open(str(file)) as f:
+            return f.getnframes() * 1000. / f.getframerate()
+    except (wave.Error, EOFError):
+        return AudioSegment.from_file(file).duration_ms
+
+
+def fit_speed(audio_duration: float, left_border: float, need_duration: float, right_border: float) -> float:
+    """Speed change required to fit audio to the borders of the subtitles (1 if it already fits)."""
+    if audio_duration > (free := (left_border + need_duration + right_border)):
+        return audio_duration / free
+    return 1.
+
+
+def fit_silence(audio_duration: float, left_border: float, need_duration: float, right_border: float,
+                align: float) -> float:
+    """Duration of silence before already fitted audio."""
+    if audio_duration > need_duration + right_border:
+        return (left_border + need_duration + right_border - audio_duration) / align
+    return left_border
+
+
+def fit_offset(audio: AudioSegment | Samples,
+               left_border: float, need_duration: float, right_border: float,
+               align: float) -> tuple[AudioSegment | Samples, float]:
+    """Fits audio to the borders of the subtitles. Returns audio and duration of silence before it."""
+    audio = speed_change(audio, fit_speed(audio.duration_ms, left_border, need_duration, right_border))
+    return audio, fit_silence(audio.duration_ms, left_border, need_duration, right_border, align)
+
+
+def fit(audio: AudioSegment | Samples,
         left_border: float, need_duration: float, right_border: float,
-        align: float) -> AudioSegment:
-    """Fits audio to the borders of the subtitles."""
-    if (audio_duration := audio.duration_ms) > (free := (left_border + need_duration + right_border)):
-        audio = speed_change(audio, audio_duration / free)
-        audio_duration = audio.duration_ms
-    return AudioSegment.silent(
-        (free - audio_duration) / align
-        if audio_duration > need_duration + right_border
-        else left_border) + audio
+        align: float) -> AudioSegment | Samples:
+    """Fits audio to the borders of the subtitles (the result is of the type of audio)."""
+    fitted, silence_ms = fit_offset(audio, left_border, need_duration, right_border, align)
+    return _like(audio, AudioBuilder().append_silence(silence_ms).append(fitted).build())
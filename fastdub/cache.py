@@ -0,0 +1,359 @@
+"""Size-bounded TTS cache: clips in a directory, indexed by SQLite, least recently used clips are evicted."""
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import struct
+import tempfile
+import threading
+import wave
+from contextlib import contextmanager, suppress
+from hashlib import md5
+from pathlib import Path
+from time import time
+from typing import Iterable
+
+from fastdub import PrettyViewPrefix
+from fastdub.audio import AudioSegment, to_numpy, wav_duration_ms
+
+try:
+    import soundfile
+except (ImportError, OSError):
+    # FLAC clips are encoded and decoded by ffmpeg (a process per clip)
+    soundfile = None
+
+__all__ = ('DEFAULT_CACHE_DIR', 'DEFAULT_CACHE_SIZE', 'CLIP_FORMATS', 'TTSCache',
+           'read_clip', 'clip_duration_ms', 'read_pcm', 'write_pcm', 'read_flac', 'write_flac')
+
+DEFAULT_CACHE_DIR = Path(os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME')
+                         or Path.home() / '.cache') / 'fastdub' / 'tts'
+DEFAULT_CACHE_SIZE = 2 * 1000 ** 3
+INDEX_FILE = 'index.sqlite3'
+_QUERY_CHUNK = 500
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS clips (
+    key TEXT PRIMARY KEY,
+    voice TEXT NOT NULL,
+    chars INTEGER NOT NULL,
+    duration_ms REAL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS clips_last_access ON clips (last_access);
+'''
+# columns added to the index after its first version
+_COLUMNS = {'rate': 'REAL', 'format': 'TEXT', 'trimmed_ms': 'REAL'}
+_MIN_SPEECH_RATE_CLIPS = 20
+
+CLIP_FORMATS = ('wav', 'flac', 'pcm')
+PCM_MAGIC = b'FDPC'
+# magic, frame rate; mono little-endian int16 samples follow
+PCM_HEADER = struct.Struct('<4sI')
+
+
+def write_pcm(segment: AudioSegment, file: str | os.PathLike):
+    """Writes audio as a raw mono int16 PCM clip with a small header."""
+    segment = segment.set_channels(1).set_sample_width(2)
+    with open(file, 'wb') as f:
+        f.write(PCM_HEADER.pack(PCM_MAGIC, segment.frame_rate))
+        f.write(segment.raw_data)
+
+
+def _pcm_frame_rate(f) -> int:
+    magic, frame_rate = PCM_HEADER.unpack(f.read(PCM_HEADER.size))
+    if magic != PCM_MAGIC:
+        raise ValueError(f'{f.name!r} is not a PCM clip')
+    return frame_rate
+
+
+def read_pcm(file: str | os.PathLike) -> AudioSegment:
+    """Reads a PCM clip (see `write_pcm`) straight into an AudioSegment."""
+    with open(file, 'rb') as f:
+        frame_rate = _pcm_frame_rate(f)
+        return AudioSegment(f.read(), sample_width=2, frame_rate=frame_rate, channels=1)
+
+
+def read_flac(file: str | os.PathLike) -> AudioSegment:
+    """Reads a FLAC clip, in-process by soundfile if it is installed (FastDub[FLAC]), else by ffmpeg."""
+    if soundfile is None:
+        return AudioSegment.from_file(file, 'flac')
+    data, frame_rate = soundfile.read(file, dtype='int16', always_2d=True)
+    return AudioSegment(data.tobytes(), sample_width=2, frame_rate=frame_rate, channels=data.shape[1])
+
+
+def write_flac(segment: AudioSegment, file: str | os.PathLike):
+    """Writes a FLAC clip, in-process by soundfile if it is installed and the audio is 16 bit, else by ffmpeg."""
+    if soundfile is None or segment.sample_width != 2:
+        segment.export(file, 'flac')
+    else:
+        soundfile.write(file, to_numpy(segment), segment.frame_rate, 'PCM_16', format='FLAC')
+
+
+def _flac_duration_ms(file: str | os.PathLike) -> float:
+    """Duration of FLAC file by its STREAMINFO block (the file is decoded only if it has no total samples)."""
+    with open(file, 'rb') as f:
+        header = f.read(26)
+    if header[:4] == b'fLaC' and not header[4] & 0x7f:
+        stream_info = int.from_bytes(header[18:26], 'big')
+        frame_rate, frames = stream_info >> 44, stream_info & 0xfffffffff
+        if frame_rate and frames:
+            return frames * 1000. / frame_rate
+    return read_flac(file).duration_ms
+
+
+def _clip_format(file: str | os.PathLike) -> str:
+    return os.path.splitext(file)[1][1:].casefold()
+
+
+def read_clip(file: str | os.PathLike) -> AudioSegment:
+    """Reads a cached clip of any of `CLIP_FORMATS` by its extension."""
+    if (clip_format := _clip_format(file)) == 'pcm':
+        return read_pcm(file)
+    if clip_format == 'flac':
+        return read_flac(file)
+    return AudioSegment.from_file(file, clip_format)
+
+
+def clip_duration_ms(file: str | os.PathLike) -> float:
+    """Duration of a cached clip of any of `CLIP_FORMATS` by its header."""
+    if (clip_format := _clip_format(file)) == 'pcm':
+        with open(file, 'rb') as f:
+            return (os.fstat(f.fileno()).st_size - PCM_HEADER.size) * 500. / _pcm_frame_rate(f)
+    if clip_format == 'flac':
+        return _flac_duration_ms(file)
+    return wav_duration_ms(file)
+
+
+class TTSCache:
+    """
+    Clips are moved into the directory by atomic renames, the index (key, voice, length of text, duration, size,
+    last access time, engine rate, format) is shared by processes through SQLite locking.
+    When the clips exceed max_bytes, the least recently used ones are removed.
+    New clips are stored in clip_format (one of `CLIP_FORMATS`), clips of other formats are still read.
+    """
+    __slots__ = ('directory', 'max_bytes', 'clip_format', 'hits', 'misses', '_nul_file', '_prepared',
+                 '_connections')
+
+    def __init__(self, directory: str | os.PathLike = None, max_bytes: int = DEFAULT_CACHE_SIZE,
+                 clip_format: str = 'wav'):
+        if clip_format not in CLIP_FORMATS:
+            raise ValueError(f'{clip_format!r} not in {CLIP_FORMATS}')
+        self.directory = Path(DEFAULT_CACHE_DIR if directory is None else directory)
+        self.max_bytes = max_bytes
+        self.clip_format = clip_format
+        self.hits = self.misses = 0
+        self._nul_file = str(self.directory / 'nul.wav')
+        self._prepared = False
+        # connection and pid of every thread
+        self._connections = threading.local()
+
+    def __reduce__(self):
+        return self.__class__, (str(self.directory), self.max_bytes, self.clip_format)
+
+    def _prepare(self):
+        """Creates the directory and the silent clip on first use."""
+        if self._prepared:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._prepared = True
+        if not os.path.isfile(self._nul_file):
+            temp_file = self.temp_path()
+            AudioSegment.silent(0).export(temp_file, 'wav')
+            os.replace(temp_file, self._nul_file)
+
+    @property
+    def nul_file(self) -> str:
+        """Silent clip of empty lines."""
+        self._prepare()
+        return self._nul_file
+
+    def _db(self) -> sqlite3.Connection:
+        """Connection of the current thread (a forked process opens its own)."""
+        local = self._connections
+        if getattr(local, 'pid', None) != os.getpid():
+            self._prepare()
+            local.connection = sqlite3.connect(self.directory / INDEX_FILE, 60., isolation_level=None)
+            local.connection.execute('PRAGMA synchronous=NORMAL')
+            local.connection.executescript(_SCHEMA)
+            local.pid = os.getpid()
+            with self._transaction() as db:
+                columns = {name for _, name, *_ in db.execute('PRAGMA table_info(clips)')}
+                for name, column_type in _COLUMNS.items():
+                    if name not in columns:
+                        db.execute(f'ALTER TABLE clips ADD COLUMN {name} {column_type}')
+        return local.connection
+
+    @contextmanager
+    def _transaction(self) -> sqlite3.Connection:
+        """Write transaction, other processes wait for it (up to the connection timeout)."""
+        db = self._db()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    @staticmethod
+    def key(text: str, **properties) -> str:
+        """Key of a clip by its text and every engine property that affects the output (voice, rate, ...)."""
+        return md5(json.dumps((text, properties), sort_keys=True).encode()).hexdigest()
+
+    def path(self, key: str, clip_format: str = None) -> str:
+        return str(self.directory / f'{key}.{clip_format or self.clip_format}')
+
+    def temp_path(self, clip_format: str = 'wav') -> str:
+        """New file in the cache directory to write a clip to (see `TTSCache.put`)."""
+        self._prepare()
+        fd, path = tempfile.mkstemp(f'.{clip_format}', '.tmp-', self.directory)
+        os.close(fd)
+        return path
+
+    def find(self, keys: Iterable[str], count: bool = True) -> dict[str, str]:
+        """
+        Paths of cached keys of keys, their last access time is updated.
+        Counts hits and misses (unless keys were already looked up, count=False).
+        """
+        keys = [*keys]
+        found = {}
+        if not keys:
+            return found
+        with self._transaction() as db:
+            unique = [*{*keys}]
+            for i in range(0, len(unique), _QUERY_CHUNK):
+                chunk = unique[i:i + _QUERY_CHUNK]
+                found.update((key, self.path(key, clip_format or 'wav')) for key, clip_format in db.execute(
+                    f'SELECT key, format FROM clips WHERE key IN ({",".join("?" * len(chunk))})', chunk))
+            if lost := [key for key, path in found.items() if not os.path.isfile(path)]:
+                db.executemany('DELETE FROM clips WHERE key = ?', ((key,) for key in lost))
+                for key in lost:
+                    del found[key]
+            now = time()
+            db.executemany('UPDATE clips SET last_access = ? WHERE key = ?', ((now, key) for key in found))
+        if count:
+            hits = sum(key in found for key in keys)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return found
+
+    def get(self, key: str) -> str | None:
+        """Path of the cached clip or None."""
+        return self.find((key,)).get(key)
+
+    def put(self, key: str, clip: str | AudioSegment, voice: str = '', chars: int = 0, rate: float = None,
+            trimmed_ms: float = 0.) -> str:
+        """
+        Moves the WAV file (see `TTSCache.temp_path`) or writes the audio into the cache
+        (encoded to `TTSCache.clip_format`), indexes it and evicts the least recently used clips.
+        trimmed_ms is the duration of silence cut from the clip (see `audio.trim_silence`).
+        Returns the path of the clip.
+        """
+        path = self.path(key)
+        if isinstance(clip, AudioSegment):
+            duration_ms = clip.duration_ms
+            file = self._encode(clip)
+        else:
+            file = clip
+            try:
+                duration_ms = wav_duration_ms(file)
+            except (OSError, EOFError, wave.Error):
+                duration_ms = None
+            if self.clip_format != 'wav':
+                file = self._encode(AudioSegment.from_file(clip, 'wav'))
+                os.remove(clip)
+        size = os.path.getsize(file)
+        os.replace(file, path)
+        with self._transaction() as db:
+            if (previous := db.execute('SELECT format FROM clips WHERE key = ?', (key,)).fetchone()) and (
+                    previous_path := self.path(key, previous[0] or 'wav')) != path:
+                with suppress(FileNotFoundError):
+                    os.remove(previous_path)
+            db.execute('INSERT OR REPLACE INTO clips'
+                       ' (key, voice, chars, duration_ms, size, last_access, rate, format, trimmed_ms)'
+                       ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                       (key, voice, chars, duration_ms, size, time(), rate, self.clip_format, trimmed_ms))
+            self._evict(db, key)
+        return path
+
+    def _encode(self, clip: AudioSegment) -> str:
+        """Temporary file of the audio in `TTSCache.clip_format`."""
+        file = self.temp_path(self.clip_format)
+        if self.clip_format == 'pcm':
+            write_pcm(clip, file)
+        elif self.clip_format == 'flac':
+            write_flac(clip, file)
+        else:
+            clip.export(file, self.clip_format)
+        return file
+
+    def _evict(self, db: sqlite3.Connection, keep: str = None):
+        total, = db.execute('SELECT COALESCE(SUM(size), 0) FROM clips').fetchone()
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for key, size, clip_format in db.execute(
+                'SELECT key, size, format FROM clips WHERE key != ? ORDER BY last_access', (keep,)):
+            if total <= self.max_bytes:
+                break
+            evicted.append((key, clip_format))
+            total -= size
+        db.executemany('DELETE FROM clips WHERE key = ?', ((key,) for key, _ in evicted))
+        for key, clip_format in evicted:
+            with suppress(FileNotFoundError):
+                os.remove(self.path(key, clip_format or 'wav'))
+
+    def trimmed_ms(self, keys: Iterable[str]) -> dict[str, float]:
+        """Durations of silence cut from cached clips of keys (clips of older runs are skipped)."""
+        unique = [*{*keys}]
+        trimmed = {}
+        db = self._db()
+        for i in range(0, len(unique), _QUERY_CHUNK):
+            chunk = unique[i:i + _QUERY_CHUNK]
+            trimmed.update(db.execute(f'SELECT key, trimmed_ms FROM clips'
+                                      f' WHERE trimmed_ms > 0 AND key IN ({",".join("?" * len(chunk))})', chunk))
+        return trimmed
+
+    def speech_rates(self, min_clips: int = _MIN_SPEECH_RATE_CLIPS) -> dict[str, float]:
+        """
+        Voice id -> duration of a character at engine rate 1 (ms * rate / char), by cached clips.
+        Voices with less than min_clips clips are skipped.
+        """
+        return dict(self._db().execute(
+            'SELECT voice, SUM(duration_ms * rate) / SUM(chars) FROM clips'
+            ' WHERE chars > 0 AND duration_ms > 0 AND rate > 0 GROUP BY voice HAVING COUNT(*) >= ?', (min_clips,)))
+
+    def usage(self) -> tuple[int, int]:
+        """(count, total size) of cached clips."""
+        return self._db().execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM clips').fetchone()
+
+    def clear(self):
+        """
+        Removes files of the cache: indexed clips, temporary files, the silent clip and the index.
+        Other files of the directory are kept (the directory is removed only if it is left empty).
+        """
+        files = [self._nul_file]
+        if (self.directory / INDEX_FILE).is_file():
+            files += (self.path(key, clip_format or 'wav')
+                      for key, clip_format in self._db().execute('SELECT key, format FROM clips'))
+        local = self._connections
+        if getattr(local, 'pid', None) == os.getpid():
+            local.connection.close()
+        local.connection = local.pid = None
+        self._prepared = False
+        files += (self.directory / f'{INDEX_FILE}{suffix}' for suffix in ('', '-journal', '-wal', '-shm'))
+        files += self.directory.glob('.tmp-*')
+        for file in files:
+            with suppress(FileNotFoundError):
+                os.remove(file)
+        with suppress(OSError):
+            self.directory.rmdir()
+
+    def report(self) -> str:
+        count, size = self.usage()
+        lookups = self.hits + self.misses
+        return (f'TTS cache: {self.hits} hits, {self.misses} misses'
+                f' ({self.hits / (lookups or 1):.1%} hit rate), {count} clips,'
+                f' {PrettyViewPrefix.from_bytes(size)} of {PrettyViewPrefix.from_bytes(self.max_bytes)}')
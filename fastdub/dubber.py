@@ -1,36 +1,121 @@
 from __future__ import annotations
 
+import json
 import logging
 import os.path
 import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from copy import copy
 from pathlib import Path
-from typing import Sequence
+from time import perf_counter
+from typing import Callable, Sequence
 
+import numpy as np
 from tqdm import tqdm
 
-from fastdub import audio, subtitles, voicer, GlobalSettings
-from fastdub.audio import AudioSegment, calc_speed_change_ffmpeg_arg
-from fastdub.ffmpeg_wrapper import FFmpegWrapper
+from fastdub import audio, cache, planner, subtitles, voicer, GlobalSettings
+from fastdub.audio import AudioSegment
+from fastdub.cache import TTSCache
+from fastdub.ffmpeg_wrapper import DefaultFFmpegParams, FFmpegWrapper
 
-__all__ = ('Dubber', 'VOICER')
+__all__ = ('Dubber', 'VOICER', 'jobs_budget')
 
-from fastdub.subtitles import Line, TimeLabel
+from fastdub.subtitles import Line, SubtitleTrack
 
 VOICER = voicer.Voicer()
 
+JOB_BASE_MEMORY = 256 * 1024 * 1024
+TRACK_BYTES_PER_MS = 44.1 * 2
+TRACK_COPIES = 4
+
+
+def _settings_state(cls: type) -> dict:
+    return {name: value for name, value in vars(cls).items() if not name.startswith('_')}
+
+
+def _init_job_worker(voice_id: str, tts_cache: TTSCache, tts_backend: voicer.TTSBackend, trim_silence: float | None,
+                     settings: dict, ffmpeg_params: dict):
+    global VOICER
+    for cls, state in ((GlobalSettings, settings), (DefaultFFmpegParams, ffmpeg_params)):
+        for name, value in state.items():
+            setattr(cls, name, value)
+    GlobalSettings.tqdm_kwargs = {**GlobalSettings.tqdm_kwargs, 'disable': True}
+    VOICER = voicer.Voicer(cache=tts_cache, backend=tts_backend, trim_silence=trim_silence)
+    VOICER.backend.set_property('voice', voice_id)
+
+
+def _dub_job(job_dubber: Dubber, file: tuple[str, str | None, str],
+             tts_jobs: Sequence[tuple[str, str, int | None]] | None) -> tuple[int, int]:
+    """`Dubber.dub_one` in a job worker, returns its TTS cache (hits, misses)."""
+    hits, misses = VOICER.cache.hits, VOICER.cache.misses
+    job_dubber.dub_one(*file, tts_jobs=tts_jobs)
+    return VOICER.cache.hits - hits, VOICER.cache.misses - misses
+
+
+def _read_samples(cached: str) -> audio.Samples:
+    """Samples of a cached TTS clip (a view of the decoded clip)."""
+    return audio.Samples.from_segment(cache.read_clip(cached))
+
+
+def _fitted_clip(cached: str, speed: float) -> audio.Samples:
+    return audio.speed_change(_read_samples(cached), speed)
+
+
+def _free_memory() -> float:
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return float('inf')
+
+
+def _track_end_ms(file: tuple[str, str | None, str]) -> int:
+    """End of the last subtitle of (fn, video, subtitles) file, 0 if the subtitles could not be read."""
+    fn, _, sub = file
+    try:
+        subs = subtitles.parse(sub)
+    except Exception as e:
+        # dubbed (and failed) as usual
+        logging.warning(f'{fn!r} is not budgeted: {e!r}')
+        return 0
+    return subs[-1].ms.end if subs else 0
+
+
+def jobs_budget(files: Sequence[tuple[str, str | None, str]], jobs: int) -> int:
+    """
+    How many of (fn, video, subtitles) files can be dubbed at once:
+    at most jobs, cpu count, and as many as free RAM and free disk space of the result directories allow.
+    """
+    if (jobs := min(jobs, os.cpu_count() or 1, len(files))) < 2:
+        return jobs
+    track_ms = max(map(_track_end_ms, files), default=0)
+    track_bytes = track_ms * TRACK_BYTES_PER_MS
+    memory_jobs = _free_memory() // (JOB_BASE_MEMORY + track_bytes * TRACK_COPIES)
+    job_disk = max(2 * track_bytes + (os.path.getsize(vid) if vid else 0) for _, vid, _ in files) or 1
+    disk_jobs = min(shutil.disk_usage(Path(sub).parent).free for *_, sub in files) // job_disk
+    return int(max(1, min(jobs, memory_jobs, disk_jobs)))
+
 
 class Dubber:
     __slots__ = (
-        'fit_align', 'language', 'audio_format',
-        'cleanup_audio', 'export_video',
+        'fit_align', 'language', 'audio_format', 'tts_workers', 'debug_parts', 'batch_speed_change',
+        'cleanup_audio', 'export_video', 'jobs', 'streaming', 'incremental', 'rate_control',
         'ducking',
         'sidechain_level_sc', 'sidechain_ffmpeg_params'
     )
 
     def __init__(self, voice: str, language: str, audio_format: str,
                  ducking: bool, sidechain_level_sc: float, sidechain_ffmpeg_params: str,
-                 fit_align: float = 2., cleanup_audio: bool = True, export_video: bool = True):
+                 fit_align: float = 2., cleanup_audio: bool = True, export_video: bool = True,
+                 tts_workers: int = 1, debug_parts: bool = False, batch_speed_change: bool = False,
+                 jobs: int = 1, streaming: bool = False, incremental: bool = False, rate_control: bool = True):
         self.language = language
+        self.rate_control = rate_control
+        self.incremental = incremental
+        self.streaming = streaming
+        self.jobs = jobs
+        self.batch_speed_change = batch_speed_change
+        self.tts_workers = tts_workers
+        self.debug_parts = debug_parts
         self.audio_format = audio_format
         self.fit_align = fit_align
         if voice:
@@ -61,11 +146,86 @@ class Dubber:
             videos[filename] = {ext: os.path.join(path_to_files, file)}
         return videos
 
-    def dub_dir(self, videos: dict[str, dict[str, str]], video_format: str, subtitles_format: str):
-        for fn, exts in videos.items():
-            self.dub_one(fn, exts.get(video_format), exts.get(subtitles_format))
+    def dub_dir(self, videos: dict[str, dict[str, str]], video_format: str, subtitles_format: str) -> list[str]:
+        """
+        Dubs files one by one or, if self.jobs > 1, several at once in worker processes (see `jobs_budget`),
+        TTS workers (and workers of a parallel TTS backend) are divided between them.
+        Lines of several files are synthesized beforehand, once per unique line (see `Dubber.plan_synthesis`).
+        In parallel mode a failed file is logged and skipped. Returns names of failed files.
+        """
+        files = [(fn, exts.get(video_format), sub) for fn, exts in videos.items()
+                 if (sub := exts.get(subtitles_format))]
+        files_jobs = dict(zip((fn for fn, *_ in files), self.plan_synthesis(files))) if len(files) > 1 else {}
+        if (jobs := jobs_budget(files, self.jobs)) < 2:
+            for fn, exts in videos.items():
+                self.dub_one(fn, exts.get(video_format), exts.get(subtitles_format), tts_jobs=files_jobs.get(fn))
+            return []
+
+        logging.info(f'dubbing {len(files)} files in {jobs} processes')
+        job_dubber = copy(self)
+        job_dubber.tts_workers = max(1, self.tts_workers // jobs)
+        job_backend = copy(VOICER.backend)
+        if job_backend.parallel:
+            job_backend.workers = job_dubber.tts_workers
+        failed = []
+        with ProcessPoolExecutor(jobs, initializer=_init_job_worker,
+                                 initargs=(VOICER.backend.get_property('voice'), VOICER.cache, job_backend,
+                                           VOICER.trim_silence,
+                                           _settings_state(GlobalSettings),
+                                           _settings_state(DefaultFFmpegParams))) as pool:
+            futures = {pool.submit(_dub_job, job_dubber, file, files_jobs.get(file[0])): file[0] for file in files}
+            with tqdm(as_completed(futures), 'Files', len(futures), unit='file',
+                      **GlobalSettings.tqdm_kwargs) as pb:
+                for future in pb:
+                    fn = futures[future]
+                    try:
+                        hits, misses = future.result()
+                    except Exception as e:
+                        failed.append(fn)
+                        logging.error(f'{fn!r} failed: {e!r}')
+                        pb.set_postfix(failed=len(failed))
+                    else:
+                        VOICER.cache.hits += hits
+                        VOICER.cache.misses += misses
+                        logging.info(f'{fn!r} done')
+        return failed
+
+    def plan_synthesis(self, files: Sequence[tuple[str, str | None, str]]
+                       ) -> list[list[tuple[str, str, int | None]] | None]:
+        """
+        Resolves TTS jobs of all (fn, video, subtitles) files in order (voice anchors carry over as when dubbing
+        them one by one) and synthesizes every unique line (text, voice and rate) once, longest first.
+        Returns jobs of every file (see tts_jobs of `Dubber.dub_one`, None if its subtitles could not be read),
+        logs the dedup ratio and the estimated synthesis time saved.
+        """
+        voice_id = VOICER.backend.get_property('voice')
+        files_jobs = []
+        for fn, target_vid, target_sub in files:
+            try:
+                files_jobs.append(self._resolve(self._read_subtitles(target_vid, target_sub),
+                                                self._known_rates(fn, target_sub)))
+            except Exception as e:
+                # dubbed (and failed) as usual
+                logging.warning(f'{fn!r} is not planned: {e!r}')
+                files_jobs.append(None)
+        VOICER.backend.set_property('voice', voice_id)
 
-    def dub_one(self, fn: str, target_vid: str, target_sub: str, cleanup_audio: bool = None, export_video: bool = None):
+        properties = VOICER.properties()
+        lines = [(VOICER.cache_key(*job, properties=properties), job)
+                 for jobs in files_jobs if jobs for job in jobs if job[0]]
+        if not (unique := dict(lines)):
+            return files_jobs
+        tts_start = perf_counter()
+        self._synthesize(sorted(unique.values(), key=lambda job: len(job[0]), reverse=True))
+        tts_elapsed = perf_counter() - tts_start
+        logging.info(f'TTS plan: {len(unique)} unique of {len(lines)} lines in {len(files)} files '
+                     f'(dedup ratio {len(lines) / len(unique):.2f}), '
+                     f'~{tts_elapsed / len(unique) * (len(lines) - len(unique)):.1f}s of synthesis saved')
+        return files_jobs
+
+    def dub_one(self, fn: str, target_vid: str, target_sub: str, cleanup_audio: bool = None, export_video: bool = None,
+                tts_jobs: Sequence[tuple[str, str, int | None]] | None = None):
+        """tts_jobs are resolved jobs of lines (see `Dubber.plan_synthesis`), by default resolved from the subtitles."""
         if target_vid is None and target_sub is None:
             return
         if cleanup_audio is None:
@@ -74,93 +234,266 @@ class Dubber:
             export_video = self.export_video
 
         logging.info(f'start voice file {fn!r}')
-        result_dir = Path(target_sub).parent / '_result'
+        manifest_file = self._manifest_file(fn, target_sub)
+        result_dir = manifest_file.parent
         result_dir.mkdir(exist_ok=True)
         out_audio_base = result_dir / f'{fn}_{self.language}.{self.audio_format}'
 
-        subs = subtitles.parse(target_sub)
-        default_right_border = 0
-        if target_vid and subs:
-            default_right_border = FFmpegWrapper.get_video_duration_ms(target_vid)
-        default_right_border = max(default_right_border, end := subs[-1].ms.end)
-        subs += Line(TimeLabel(default_right_border, end, end - default_right_border)),
+        subs = self._read_subtitles(target_vid, target_sub)
 
         progress_total = len(subs) - 1
 
-        fit_align = self.fit_align
-        audio_format = self.audio_format
+        voice_id = VOICER.backend.get_property('voice')
+        previous = self._read_manifest(manifest_file) if self.incremental else None
+        jobs = self._resolve(subs, previous and previous.get('rates')) if tts_jobs is None else tts_jobs
+        properties = VOICER.properties()
+        keys = [VOICER.cache_key(*job, properties=properties) if job[0] else '' for job in jobs]
+        cached_tts: list[str | None] = [None] * len(jobs)
 
-        working_dir = result_dir / '_working_dir'
-        working_dir.mkdir(exist_ok=True)
+        track_file = str(result_dir / f'_{fn}_{self.language}.wav')
+        result_out_audio = str(out_audio_base)
+        known_durations = {key: tts_duration_ms for key, *_, tts_duration_ms in previous['lines']} if previous else {}
+        # lines planned by plan_synthesis are already counted in the cache report
+        count_lookups = tts_jobs is None
+        self._synthesize_at(jobs, cached_tts, [i for i, key in enumerate(keys) if key not in known_durations],
+                            count_lookups)
 
-        filenames: tuple[str] = *map(
-            str(working_dir / ('{0:0>%i}.%s' % (len(str(progress_total)), audio_format))).format, range(len(subs))),
+        part_name = None
+        if self.debug_parts:
+            working_dir = result_dir / '_working_dir'
+            working_dir.mkdir(exist_ok=True)
+            part_name = str(working_dir / ('{0:0>%i}.%s' % (len(str(progress_total)), self.audio_format))).format
 
-        filename_sub = *zip(filenames_striped := filenames[:-1], subs[:-1]),
-        cached_tts = [VOICER.voice(line.text) for fn, line in tqdm(filename_sub,
-                                                                   desc='TTS',
-                                                                   total=progress_total, unit='line',
-                                                                   dynamic_ncols=True)]
+        durations = [known_durations[key] if key in known_durations else cache.clip_duration_ms(cached)
+                     for key, cached in zip(keys, cached_tts)]
+        plan = self._plan(subs, durations)
+        self._report_rate_control(jobs, plan)
+        self._report_trimming(subs, keys, durations, plan)
+        track_end = int(subs.start[-1])
 
-        total_duration_ms = 0
-        for pos, ((tts_fn, line), cached) in tqdm(
-                enumerate(zip(filename_sub, cached_tts), 1),
-                desc='Fitting',
-                total=progress_total, unit='line',
-                **GlobalSettings.tqdm_kwargs):
-            ms = line.ms
-            new_audio = audio.fit(
-                AudioSegment.from_file(cached, 'wav'),
-                ms.start - total_duration_ms,
-                ms.duration,
-                subs[pos].ms.start - ms.end,
-                fit_align
-            )
-            total_duration_ms += new_audio.duration_ms
-            new_audio.export(tts_fn, audio_format)
-        with open(list_file := working_dir / 'list.txt', 'w') as f:
-            f.writelines(f"file '{fn}'\n" for fn in filenames_striped)
-        max_duration = subs[-1].ms.end
-
-        ffmpeg_concat_args = ()
-        if total_duration_ms > max_duration:
-            change_speed = total_duration_ms / max_duration
-            logging.info(f'changing audio speed {change_speed:g}')
-            ffmpeg_concat_args += '-af', calc_speed_change_ffmpeg_arg(change_speed)
+        manifest = {
+            'params': {'align': self.fit_align, 'voice': voice_id, 'track_end': track_end,
+                       'speed_change_backend': GlobalSettings.speed_change_backend,
+                       'batch_speed_change': self.batch_speed_change},
+            'lines': [[key, speed, position_ms, duration_ms / speed, duration_ms]
+                      for key, duration_ms, (speed, _, position_ms) in zip(keys, durations, plan)]}
+        if self.rate_control:
+            manifest['rates'] = dict(zip(self._rate_keys(jobs, np.diff(subs.start)), (rate for *_, rate in jobs)))
+        if (changed := self._changed_lines(previous, manifest, track_file)) is None:
+            self._synthesize_at(jobs, cached_tts, [i for i, cached in enumerate(cached_tts) if cached is None],
+                                count_lookups)
+            if self.streaming:
+                with audio.TrackWriter(track_file) as track:
+                    self._render(cached_tts, plan, track, part_name)
+            else:
+                track = audio.TrackBuffer(track_end)
+                self._render(cached_tts, plan, track, part_name)
+                track.to_segment().export(track_file, 'wav')
+                del track
         else:
-            ffmpeg_concat_args += '-c', 'copy'
+            logging.info(f'patching {len(changed)} of {progress_total} lines')
+            self._synthesize_at(jobs, cached_tts, changed, count_lookups)
+            previous_lines = {(*line,) for line in previous['lines']}
+            lines = {(*line,) for line in manifest['lines']}
+            with audio.TrackPatcher(track_file) as track:
+                for _, _, position_ms, duration_ms, _ in previous_lines - lines:
+                    track.clear(position_ms, duration_ms)
+                self._render([cached_tts[i] for i in changed], [plan[i] for i in changed], track)
+        if self.incremental:
+            manifest_file.write_text(json.dumps(manifest), 'UTF-8')
 
-        temp_audio_file = str(out_audio_base.with_stem(f'_{out_audio_base.stem}'))
-        logging.info('concatenating parts...')
-        FFmpegWrapper.convert('-f', 'concat', '-safe', '0', '-i', list_file, *ffmpeg_concat_args,
-                              temp_audio_file)
-        cur_audio = audio.AudioSegment.from_file(temp_audio_file)
-        shutil.rmtree(working_dir, ignore_errors=True)
+        if not target_vid:
+            if self.incremental or self.audio_format != 'wav':
+                FFmpegWrapper.convert('-i', track_file, result_out_audio)
+            else:
+                os.replace(track_file, result_out_audio)
+        elif export_video:
+            logging.info('sidechain' if self.ducking else 'amix')
+            FFmpegWrapper.dub_video(target_vid, track_file, target_sub,
+                                    result_dir / f'{fn}_{self.language}.mkv',
+                                    self.ducking, self.sidechain_level_sc, self.sidechain_ffmpeg_params,
+                                    None if cleanup_audio else result_out_audio, self.audio_format)
+        elif self.ducking:
+            logging.info('sidechain')
+            FFmpegWrapper.sidechain(target_vid,
+                                    track_file,
+                                    result_out_audio,
+                                    self.sidechain_level_sc,
+                                    self.sidechain_ffmpeg_params)
+        else:
+            logging.info('amix')
+            FFmpegWrapper.amix(target_vid, track_file, out=result_out_audio)
+        if not self.incremental and os.path.isfile(track_file):
+            os.remove(track_file)
 
-        if total_duration_ms != max_duration:
-            cur_audio = audio.AudioSegment.silent(
-                min(max_duration - total_duration_ms, subs[0].ms.start)
-            ) + cur_audio
+    def dub_lines(self, lines: Sequence[Line] | SubtitleTrack | str, duration_ms: float = 0) -> AudioSegment:
+        """
+        Returns the fitted voice track of subtitles lines (or .srt text) without writing any files
+        except the TTS cache. duration_ms is the video duration (the right border of the last line).
+        Speed changes are done in memory with the numpy backend (see `GlobalSettings.speed_change_backend`).
+        Use `audio.to_numpy` to get samples.
+        """
+        if isinstance(lines, str):
+            lines = subtitles.parse(lines)
+        if not isinstance(lines, SubtitleTrack):
+            lines = SubtitleTrack.from_lines(lines)
+        if not len(lines):
+            return AudioSegment.silent(0)
+        subs = self._with_right_border(lines, duration_ms)
+        # voice anchors of the lines do not change the voice of later calls
+        voice_id = VOICER.backend.get_property('voice')
+        try:
+            jobs = self._resolve(subs)
+        finally:
+            VOICER.backend.set_property('voice', voice_id)
+        cached_tts = self._synthesize(jobs)
+        durations = [*map(cache.clip_duration_ms, cached_tts)]
+        plan = self._plan(subs, durations)
+        self._report_rate_control(jobs, plan)
+        properties = VOICER.properties()
+        self._report_trimming(subs, [VOICER.cache_key(*job, properties=properties) if job[0] else ''
+                                     for job in jobs], durations, plan)
+        track = audio.TrackBuffer(int(subs.start[-1]))
+        self._render(cached_tts, plan, track)
+        return track.to_segment()
 
-        result_out_audio = str(out_audio_base)
-        if target_vid:
-            cur_audio.export(temp_audio_file, format='wav')
-            if self.ducking:
-                logging.info('sidechain')
-                FFmpegWrapper.sidechain(target_vid,
-                                        temp_audio_file,
-                                        result_out_audio,
-                                        self.sidechain_level_sc,
-                                        self.sidechain_ffmpeg_params)
-            else:
-                logging.info('amix')
-                FFmpegWrapper.amix(target_vid, temp_audio_file, out=result_out_audio)
-                # audio.AudioSegment.from_file(target_vid).overlay(cur_audio).export(result_out_audio)
-            if export_video:
-                FFmpegWrapper.save_result_data(target_vid, result_out_audio, target_sub,
-                                               result_dir / f'{fn}_{self.language}.mkv')
-                if cleanup_audio:
-                    os.remove(result_out_audio)
+    @classmethod
+    def _read_subtitles(cls, target_vid: str | None, target_sub: str) -> SubtitleTrack:
+        """Subtitles with the right border at the end of the video (see `Dubber._with_right_border`)."""
+        subs = SubtitleTrack.from_lines(subtitles.parse(target_sub))
+        return cls._with_right_border(
+            subs, FFmpegWrapper.get_video_duration_ms(target_vid) if target_vid and len(subs) else 0)
+
+    @staticmethod
+    def _with_right_border(subs: SubtitleTrack, duration_ms: float) -> SubtitleTrack:
+        """Adds the last line which start is the right border of the track (duration_ms or end of subtitles)."""
+        end = int(subs.end[-1])
+        return subs.appended(max(int(duration_ms), end), end)
+
+    def _resolve(self, subs: SubtitleTrack, known_rates: dict[str, int | None] | None = None
+                 ) -> list[tuple[str, str, int | None]]:
+        """
+        TTS jobs of lines, with raised engine rates of lines predicted to overflow (`Dubber.rate_control`).
+        Lines of known_rates (of the previous run, see `Dubber._known_rates`) keep their rates.
+        """
+        jobs = VOICER.resolve_all(subs.texts[:-1])
+        if not self.rate_control:
+            return [(text, voice_id, None) for text, voice_id in jobs]
+        jobs = VOICER.fit_rates(jobs, slots_ms := np.diff(subs.start))
+        if not known_rates:
+            return jobs
+        return [(text, voice_id, known_rates.get(key, rate))
+                for (text, voice_id, rate), key in zip(jobs, self._rate_keys(jobs, slots_ms))]
+
+    @staticmethod
+    def _rate_keys(jobs: Sequence[tuple[str, str, int | None]], slots_ms: Sequence[float]) -> list[str]:
+        """Keys of engine rates of lines in the manifest: voice id, slot and text."""
+        return [f'{voice_id}\n{int(slot_ms)}\n{text}' for (text, voice_id, _), slot_ms in zip(jobs, slots_ms)]
+
+    def _manifest_file(self, fn: str, target_sub: str) -> Path:
+        return Path(target_sub).parent / '_result' / f'_{fn}_{self.language}.json'
+
+    def _known_rates(self, fn: str, target_sub: str) -> dict[str, int | None] | None:
+        """
+        Engine rates of lines of the previous incremental run: the rates predicted from the TTS cache
+        change with every run, unchanged lines keep theirs so they are not synthesized again.
+        """
+        if not (self.incremental and self.rate_control):
+            return None
+        previous = self._read_manifest(self._manifest_file(fn, target_sub))
+        return previous.get('rates') if previous else None
+
+    @staticmethod
+    def _report_rate_control(jobs: Sequence[tuple[str, str, int | None]],
+                             plan: Sequence[tuple[float, float, float]]):
+        if raised := [speed for (*_, rate), (speed, *_) in zip(jobs, plan) if rate is not None]:
+            logging.info(f'rate control: {len(raised)} lines synthesized faster, '
+                         f'{sum(speed == 1 for speed in raised)} speed changes avoided')
+
+    def _report_trimming(self, subs: SubtitleTrack, keys: Sequence[str], durations: Sequence[float],
+                         plan: Sequence[tuple[float, float, float]]):
+        """Logs silence cut from lines (see `Voicer.trim_silence`) and speed changes it avoided."""
+        if not (trimmed := VOICER.cache.trimmed_ms(key for key in keys if key)):
+            return
+        untrimmed = [duration_ms + trimmed.get(key, 0.) for key, duration_ms in zip(keys, durations)]
+        _, speeds = planner.plan(subs.start[:-1], subs.end[:-1], untrimmed, int(subs.start[-1]), self.fit_align)
+        avoided = sum(untrimmed_speed != 1 and speed == 1
+                      for untrimmed_speed, (speed, *_) in zip(speeds.tolist(), plan))
+        logging.info(f'silence trimming: {sum(trimmed.values()) / 1000.:.1f}s cut from {len(trimmed)} lines, '
+                     f'{avoided} speed changes avoided')
+
+    def _plan(self, subs: SubtitleTrack, durations: Sequence[float]) -> list[tuple[float, float, float]]:
+        """`planner.plan` as (speed change, silence before, position) of every line."""
+        positions, speeds = planner.plan(subs.start[:-1], subs.end[:-1], durations, int(subs.start[-1]),
+                                         self.fit_align)
+        ends = positions + np.asarray(durations, np.float64) / speeds
+        silences = positions - np.concatenate(((0.,), ends[:-1]))
+        return [*zip(speeds.tolist(), silences.tolist(), positions.tolist())]
+
+    def _synthesize(self, jobs: Sequence[tuple[str, str, int | None]], count_lookups: bool = True) -> list[str]:
+        """`Voicer.synthesize_all` with progress bar."""
+        if not jobs:
+            return []
+        tts_start = perf_counter()
+        cached_tts = [*tqdm(VOICER.synthesize_all(jobs, self.tts_workers, count_lookups=count_lookups),
+                            desc='TTS',
+                            total=len(jobs), unit='line',
+                            bar_format='{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_noinv_fmt}]',
+                            **GlobalSettings.tqdm_kwargs)]
+        if tts_elapsed := perf_counter() - tts_start:
+            logging.info(f'TTS {len(jobs) / tts_elapsed:.2f} lines/s ({self.tts_workers} workers)')
+        return cached_tts
+
+    def _synthesize_at(self, jobs: Sequence[tuple[str, str, int | None]], cached_tts: list[str | None],
+                       indexes: Sequence[int], count_lookups: bool = True):
+        """`Dubber._synthesize` of jobs at indexes, their clips are set to cached_tts."""
+        for i, cached in zip(indexes, self._synthesize([jobs[i] for i in indexes], count_lookups)):
+            cached_tts[i] = cached
+
+    @staticmethod
+    def _read_manifest(manifest_file: Path) -> dict | None:
+        try:
+            return json.loads(manifest_file.read_text('UTF-8'))
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _changed_lines(previous: dict | None, manifest: dict, track_file: str) -> list[int] | None:
+        """
+        Indexes of lines whose TTS or placement differ from the previous run's manifest.
+        None if the track must be rebuilt (no manifest or track, global parameters changed, track is too short).
+        """
+        if not previous or previous['params'] != manifest['params'] or not os.path.isfile(track_file):
+            return None
+        previous_lines = {(*line,) for line in previous['lines']}
+        changed = [i for i, line in enumerate(manifest['lines']) if (*line,) not in previous_lines]
+        track_duration_ms = audio.wav_duration_ms(track_file)
+        if any(position_ms + duration_ms > track_duration_ms + 1.
+               for _, _, position_ms, duration_ms, _ in map(manifest['lines'].__getitem__, changed)):
+            return None
+        return changed
+
+    def _render(self, cached_tts: Sequence[str], plan: Sequence[tuple[float, float, float]],
+                track: audio.TrackBuffer | audio.TrackWriter, part_name: Callable[[int], str] | None = None):
+        """
+        Changes speed of TTS lines by plan and places them to the track.
+        A TrackWriter gets lines one by one (batch speed change would hold all of them in memory).
+        """
+        speeds = [speed for speed, *_ in plan]
+        batch_speed_change = self.batch_speed_change and not isinstance(track, audio.TrackWriter)
+        if self.batch_speed_change and not batch_speed_change:
+            logging.warning('batch speed change is not used with streaming, lines are fitted one by one')
+        if batch_speed_change:
+            logging.info(f'changing speed of {sum(speed != 1 for speed in speeds)} lines')
+            clips = audio.speed_change_many([*map(_read_samples, cached_tts)], speeds)
         else:
-            cur_audio.export(result_out_audio)
-        os.remove(temp_audio_file)
+            clips = map(_fitted_clip, cached_tts, speeds)
+        for pos, (clip, (_, silence_ms, position_ms)) in tqdm(
+                enumerate(zip(clips, plan), 1),
+                desc='Fitting',
+                total=len(plan), unit='line',
+                **GlobalSettings.tqdm_kwargs):
+            track.place(clip, position_ms)
+            if part_name:
+                part = audio.AudioBuilder().append_silence(silence_ms).append(clip).build()
+                part.export(part_name(pos), self.audio_format)
@@ -0,0 +1,144 @@
+"""
+Minimal libespeak-ng binding and a worker process for `voicer.EspeakNGBackend`:
+
+> python -m fastdub.espeak_ng
+
+Requests are JSON lines on stdin: {"text": ..., "voice": ..., "rate": ..., "volume": ...} or {"voices": true}.
+Every response on stdout is `RESPONSE_HEADER` (payload length, negative for an error message) and the payload:
+raw mono 16 bit PCM or JSON. The first response (without a request) is JSON of the sample rate and defaults.
+"""
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import json
+import struct
+import sys
+
+__all__ = ('RESPONSE_HEADER', 'load_library', 'library_version', 'Synthesizer', 'main')
+
+RESPONSE_HEADER = struct.Struct('<q')
+
+AUDIO_OUTPUT_SYNCHRONOUS = 2
+POS_CHARACTER = 1
+CHARS_UTF8 = 1
+RATE = 1
+VOLUME = 2
+
+_LIBRARY_NAMES = ('espeak-ng', 'espeak')
+_LIBRARY_FILES = ('libespeak-ng.so.1', 'libespeak-ng.dylib', 'libespeak-ng.dll')
+
+
+class _Voice(ctypes.Structure):
+    _fields_ = (('name', ctypes.c_char_p), ('languages', ctypes.c_char_p), ('identifier', ctypes.c_char_p),
+                ('gender', ctypes.c_ubyte), ('age', ctypes.c_ubyte), ('variant', ctypes.c_ubyte),
+                ('xx1', ctypes.c_ubyte), ('score', ctypes.c_int), ('spare', ctypes.c_void_p))
+
+
+_SYNTH_CALLBACK = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.POINTER(ctypes.c_short), ctypes.c_int, ctypes.c_void_p)
+
+
+def load_library() -> ctypes.CDLL:
+    for name in _LIBRARY_NAMES:
+        if path := ctypes.util.find_library(name):
+            return ctypes.CDLL(path)
+    for file in _LIBRARY_FILES:
+        try:
+            return ctypes.CDLL(file)
+        except OSError:
+            pass
+    raise OSError('libespeak-ng is not found')
+
+
+def library_version() -> str:
+    """Version of libespeak-ng (without initializing it)."""
+    library = load_library()
+    library.espeak_Info.argtypes = (ctypes.c_void_p,)
+    library.espeak_Info.restype = ctypes.c_char_p
+    return library.espeak_Info(None).decode()
+
+
+class Synthesizer:
+    """libespeak-ng in synchronous mode, audio is collected to memory."""
+    __slots__ = ('library', 'frame_rate', '_chunks', '_callback')
+
+    def __init__(self):
+        self.library = library = load_library()
+        library.espeak_Initialize.argtypes = (ctypes.c_int, ctypes.c_int, ctypes.c_char_p, ctypes.c_int)
+        library.espeak_SetSynthCallback.argtypes = (_SYNTH_CALLBACK,)
+        library.espeak_ListVoices.argtypes = (ctypes.c_void_p,)
+        library.espeak_ListVoices.restype = ctypes.POINTER(ctypes.POINTER(_Voice))
+        library.espeak_GetCurrentVoice.restype = ctypes.POINTER(_Voice)
+        library.espeak_SetVoiceByName.argtypes = (ctypes.c_char_p,)
+        library.espeak_SetParameter.argtypes = (ctypes.c_int, ctypes.c_int, ctypes.c_int)
+        library.espeak_GetParameter.argtypes = (ctypes.c_int, ctypes.c_int)
+        library.espeak_Synth.argtypes = (ctypes.c_char_p, ctypes.c_size_t, ctypes.c_uint, ctypes.c_int,
+                                         ctypes.c_uint, ctypes.c_uint, ctypes.c_void_p, ctypes.c_void_p)
+
+        if (frame_rate := library.espeak_Initialize(AUDIO_OUTPUT_SYNCHRONOUS, 0, None, 0)) < 0:
+            raise OSError('could not initialize espeak-ng')
+        self.frame_rate = frame_rate
+        self._chunks = []
+        self._callback = _SYNTH_CALLBACK(self._on_synth)
+        library.espeak_SetSynthCallback(self._callback)
+        library.espeak_SetVoiceByName(b'en')
+
+    def _on_synth(self, wav, samples: int, _) -> int:
+        if wav and samples > 0:
+            self._chunks.append(ctypes.string_at(wav, samples * 2))
+        return 0
+
+    def voices(self) -> list[dict]:
+        voices = self.library.espeak_ListVoices(None)
+        found = []
+        i = 0
+        while voices[i]:
+            voice = voices[i].contents
+            found.append({'id': voice.identifier.decode().lower(), 'name': voice.name.decode()})
+            i += 1
+        return found
+
+    def defaults(self) -> dict:
+        voice = self.library.espeak_GetCurrentVoice()
+        return {'frame_rate': self.frame_rate,
+                'voice': voice.contents.identifier.decode().lower() if voice and voice.contents.identifier else 'en',
+                'rate': self.library.espeak_GetParameter(RATE, 1),
+                'volume': self.library.espeak_GetParameter(VOLUME, 1) / 100.}
+
+    def synthesize(self, text: str, voice: str, rate: int, volume: float) -> bytes:
+        """Raw mono 16 bit PCM of the text at `Synthesizer.frame_rate`."""
+        library = self.library
+        if error := library.espeak_SetVoiceByName(voice.encode()):
+            raise ValueError(f'unknown voice {voice!r} ({error})')
+        library.espeak_SetParameter(RATE, int(rate), 0)
+        library.espeak_SetParameter(VOLUME, round(volume * 100), 0)
+        self._chunks = []
+        data = text.encode()
+        if error := library.espeak_Synth(data, len(data) + 1, 0, POS_CHARACTER, 0, CHARS_UTF8, None, None):
+            raise RuntimeError(f'espeak_Synth error {error}')
+        return b''.join(self._chunks)
+
+
+def _respond(out, payload: bytes, error: bool = False):
+    out.write(RESPONSE_HEADER.pack(-len(payload) if error else len(payload)))
+    out.write(payload)
+    out.flush()
+
+
+def main():
+    out = sys.stdout.buffer
+    synthesizer = Synthesizer()
+    _respond(out, json.dumps(synthesizer.defaults()).encode())
+    for line in sys.stdin.buffer:
+        try:
+            request = json.loads(line)
+            payload = (json.dumps(synthesizer.voices()).encode() if request.pop('voices', False)
+                       else synthesizer.synthesize(**request))
+        except Exception as e:
+            _respond(out, repr(e).encode(), True)
+        else:
+            _respond(out, payload)
+
+
+if __name__ == '__main__':
+    main()
@@ -8,7 +8,10 @@ from subprocess import check_call, getoutput
 
 from fastdub import GlobalSettings
 
-__all__ = ('FFmpegWrapper', 'DefaultFFmpegParams')
+__all__ = ('FFmpegWrapper', 'DefaultFFmpegParams', 'AUDIO_FORMAT_CODECS')
+
+# encoders of audio formats whose names differ from their encoder (others are used as the encoder name)
+AUDIO_FORMAT_CODECS = {'wav': 'pcm_s16le', 'mp3': 'libmp3lame', 'ogg': 'libvorbis', 'm4a': 'aac'}
 
 
 class DefaultFFmpegParams:
@@ -92,15 +95,54 @@ class FFmpegWrapper:
                 ":x='mod(n,w-text_w)':y='mod(n,h-text_h)'")
 
     @classmethod
-    def sidechain(cls, background: str, foreground: str, out: str,
-                  level_sc: float = 0.8, params: str = None):
+    def dub_video(cls, video_path, audio_path, subtitles_path, output_path,
+                  ducking: bool = True, level_sc: float = 0.8, params: str = None, audio_output_path=None,
+                  audio_format: str = 'wav'):
+        """
+        `sidechain` (or `amix`) and `save_result_data` in a single ffmpeg call:
+        the mixed audio goes straight into the output container, encoded as audio_format
+        (see `AUDIO_FORMAT_CODECS`). If audio_output_path, the mixed audio is also saved there.
+        """
+        inputs = '-i', video_path, '-i', audio_path, '-i', subtitles_path
+        maps = '-map', '0:0', '-map', '[dub]', '-map', '0:1', '-map', '2:0'
+        copy_codec = '-c'
+        mix = cls.sidechain_graph(level_sc, params) if ducking else '[0:a][1:a]amix=inputs=2:duration=longest'
+        audio_output = ()
+        if audio_output_path:
+            graph = [f'{mix},asplit=2[dub][aout]']
+            audio_output = '-map', '[aout]', audio_output_path
+        else:
+            graph = [f'{mix}[dub]']
+
+        subtitles_path = Path(subtitles_path)
+        if (subtitles_path := subtitles_path.with_stem(f'_{subtitles_path.stem}')).is_file():
+            inputs += '-i', subtitles_path
+            maps += '-map', '3:0'
+        if GlobalSettings.watermark:
+            graph.append(f'[0:0]{cls.get_watermark_vf(GlobalSettings.watermark)[1]}[v]')
+            maps = '-map', '[v]', *maps[2:]
+            copy_codec = '-c:a'
+
+        return cls.convert(
+            *inputs, '-filter_complex', ';'.join(graph), *maps,
+            '-disposition:a:0', 'default', '-disposition:a:1', '0',
+            copy_codec, 'copy', '-c:a:0', AUDIO_FORMAT_CODECS.get(audio_format, audio_format),
+            output_path, *audio_output)
+
+    @classmethod
+    def sidechain_graph(cls, level_sc: float = 0.8, params: str = None) -> str:
+        """Ducks [0:a] by [1:a] and mixes them."""
         if params is None:
             params = DefaultFFmpegParams.sidechain_args
+        return ('[1:a]asplit=2[sc][mix];'
+                f'[0:a][sc]sidechaincompress=level_sc={level_sc}:{params}[compr];'
+                '[compr][mix]amix')
+
+    @classmethod
+    def sidechain(cls, background: str, foreground: str, out: str,
+                  level_sc: float = 0.8, params: str = None):
         return cls.convert('-i', background, '-i', foreground,
-                           '-filter_complex',
-                           '[1:a]asplit=2[sc][mix];'
-                           f'[0:a][sc]sidechaincompress=level_sc={level_sc}:{params}[compr];'
-                           '[compr][mix]amix',
+                           '-filter_complex', cls.sidechain_graph(level_sc, params),
                            out)
 
     @classmethod
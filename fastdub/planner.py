@@ -0,0 +1,87 @@
+"""Global timing planner: places all TTS lines at once, distributing speed-ups instead of a greedy fit."""
+from __future__ import annotations
+
+from typing import Sequence
+
+import numpy as np
+
+__all__ = ('plan', 'pack')
+
+
+def pack(lower: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """
+    Ends of clips placed in order, every clip starts at max(its lower bound, end of the previous clip).
+    Vectorized form of ``end[i] = max(end[i - 1], lower[i]) + lengths[i]``.
+    """
+    cumulative = np.cumsum(lengths)
+    before = cumulative - lengths
+    return np.maximum.accumulate(np.maximum(lower, 0.) - before) + cumulative
+
+
+def _latest_starts(upper: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Latest start of every clip such that it and all the following clips end before their upper bounds."""
+    cumulative = np.cumsum(lengths)
+    return np.minimum.accumulate((upper - cumulative)[::-1])[::-1] + cumulative - lengths
+
+
+def _relaxed(lower: np.ndarray, upper: np.ndarray, durations: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """
+    Lengths of feasibly packed clips lengthened (slowed down, up to their durations) in order,
+    every clip as much as the packing of the previous ones and the latest starts of the next ones allow.
+    """
+    latest_ends = np.minimum(upper, np.append(_latest_starts(upper, lengths)[1:], np.inf)).tolist()
+    relaxed = lengths.tolist()
+    end = 0.
+    for i, (low, duration, length) in enumerate(zip(lower.tolist(), durations.tolist(), relaxed)):
+        start = max(low, end)
+        if length < duration:
+            relaxed[i] = length = max(length, min(duration, latest_ends[i] - start))
+        end = start + length
+    return np.array(relaxed)
+
+
+def plan(starts: Sequence[float], ends: Sequence[float], durations: Sequence[float], track_end: float,
+         align: float = 2., iterations: int = 50) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Plans positions and speed changes of TTS clips of subtitles lines (sorted by start).
+
+    A clip may start after the end of the previous subtitle and must end before the start of the next one
+    (the last one before track_end). A clip longer than the time until the next subtitle spills over
+    to the left by 1/align of the overflow.
+    The maximum speed change is minimized by bisection, then every line is slowed down as much as
+    the placement of the others allows, so lines that fit (e.g. by starting earlier) are not sped up.
+
+    Returns (positions, speed changes), both in ms / ratio arrays.
+    """
+    starts = np.asarray(starts, np.float64)
+    ends = np.asarray(ends, np.float64)
+    durations = np.asarray(durations, np.float64)
+    if not len(starts):
+        return np.empty(0), np.empty(0)
+
+    upper = np.append(starts[1:], max(track_end, ends[-1]))
+    lower = np.minimum(np.concatenate(((0.,), ends[:-1])), starts)
+    slots = np.maximum(upper - starts, 1.)
+    needed = np.maximum(durations / slots, 1.)
+
+    def lengths_at(max_speed: float) -> np.ndarray:
+        return durations / np.minimum(needed, max_speed)
+
+    low, high = 1., float(needed.max())
+    if not np.all(pack(lower, lengths_at(low)) <= upper):
+        for _ in range(iterations):
+            if high - low <= 1e-6 * high:
+                break
+            middle = (low + high) / 2.
+            if np.all(pack(lower, lengths_at(middle)) <= upper):
+                high = middle
+            else:
+                low = middle
+        low = high
+    lengths = _relaxed(lower, upper, durations, durations / np.minimum(needed, low))
+    # empty clips (e.g. anchor-only lines) are not sped up
+    speeds = np.divide(durations, lengths, out=np.ones_like(durations), where=lengths > 0)
+
+    desired = starts - np.maximum(lengths - (upper - starts), 0.) / align
+    bounded = np.maximum(lower, np.minimum(desired, _latest_starts(upper, lengths)))
+    return pack(bounded, lengths) - lengths, speeds
@@ -1,26 +1,83 @@
 from __future__ import annotations
 
+import codecs
 import datetime
+import html
 import os.path
 import re
-from typing import NamedTuple
+from typing import Iterable, Iterator, NamedTuple, Sequence
 
+import numpy as np
 from chardet import detect as detect_encoding
 
 from fastdub.ffmpeg_wrapper import FFmpegWrapper
 
-__all__ = ('LINE_REGEX',
-           'Line', 'TimeLabel',
-           'parse', 'unparse',
+__all__ = ('LINE_REGEX', 'TIME_LABEL_REGEX',
+           'VTT_TIME_LABEL_REGEX', 'VTT_TAG_REGEX', 'ASS_TIME_REGEX', 'ASS_TAG_REGEX',
+           'Line', 'TimeLabel', 'TrackLine', 'SubtitleTrack',
+           'parse', 'unparse', 'iter_srt', 'iter_vtt', 'iter_ass',
            'ms_to_srt_time')
 
 LINE_REGEX = re.compile(r'\n\n^\d+$\n', re.M)
+TIME_LABEL_REGEX = re.compile(r'\s*(\d+):(\d\d):(\d\d)[,.](\d+)\s*-->\s*(\d+):(\d\d):(\d\d)[,.](\d+)')
+VTT_TIME_LABEL_REGEX = re.compile(
+    r'\s*(?:(\d+):)?(\d\d):(\d\d)[,.](\d+)\s*-->\s*(?:(\d+):)?(\d\d):(\d\d)[,.](\d+)')
+VTT_TAG_REGEX = re.compile(r'<[^>]*>')
+ASS_TIME_REGEX = re.compile(r'\s*(\d+):(\d\d):(\d\d)[,.](\d+)')
+ASS_TAG_REGEX = re.compile(r'{[^}]*}')
+
+
+DETECT_ENCODING_SAMPLE_SIZE = 64 * 1024
+_BOMS = ((codecs.BOM_UTF8, 'utf-8-sig'),
+         (codecs.BOM_UTF32_LE, 'utf-32'), (codecs.BOM_UTF32_BE, 'utf-32'),
+         (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16'))
+_NON_ASCII_REGEX = re.compile(rb'[\x80-\xff]')
+# path: size, mtime, encoding and errors handling (see `_decode`)
+_encodings_cache: dict[str, tuple[int, int, str, str]] = {}
+
+
+def _decode(rawdata: bytes) -> tuple[str, str, str]:
+    """
+    BOM, then strict UTF-8, then chardet on a bounded sample (from the first non-ASCII byte if the first one
+    is not enough), undecodable bytes are replaced at last.
+    Returns text, its encoding and errors handling ('strict' or 'replace').
+    """
+    for bom, encoding in _BOMS:
+        if rawdata.startswith(bom):
+            return rawdata.decode(encoding), encoding, 'strict'
+    try:
+        return rawdata.decode('utf-8'), 'utf-8', 'strict'
+    except UnicodeDecodeError:
+        pass
+    # the data is not ASCII (strict UTF-8 has failed), but the first sample may be:
+    # then the sample starting from the first non-ASCII byte is detected
+    non_ascii = _NON_ASCII_REGEX.search(rawdata).start()
+    for start in dict.fromkeys((0, non_ascii)):
+        encoding = detect_encoding(rawdata[start:start + DETECT_ENCODING_SAMPLE_SIZE])['encoding']
+        if encoding and encoding.casefold() != 'ascii':
+            try:
+                return rawdata.decode(encoding), encoding, 'strict'
+            except (UnicodeDecodeError, LookupError):
+                pass
+    return rawdata.decode('utf-8', 'replace'), 'utf-8', 'replace'
 
 
 def _read_file(filename) -> str:
+    """Reads text file, encoding is detected once per (path, size, mtime)."""
+    key = os.path.abspath(filename)
     with open(filename, 'rb') as file:
-        rawdata = file.read().replace(b'\r\n', b'\n')
-        return rawdata.decode(detect_encoding(rawdata)['encoding'])
+        stat = os.fstat(file.fileno())
+        rawdata = file.read()
+    if (cached := _encodings_cache.get(key)) and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+        text = rawdata.decode(*cached[2:])
+    else:
+        text, encoding, errors = _decode(rawdata)
+        _encodings_cache[key] = stat.st_size, stat.st_mtime_ns, encoding, errors
+    return text.replace('\r\n', '\n')
+
+
+def _ms_from_groups(hours: str | None, minutes: str, seconds: str, fraction: str) -> int:
+    return int(hours or 0) * 3600000 + int(minutes) * 60000 + int(seconds) * 1000 + int(fraction[:3].ljust(3, '0'))
 
 
 def ms_to_srt_time(ms: int) -> str:
@@ -68,26 +125,186 @@ class Line:
         return f'{self.__class__.__qualname__}({self.ms}: {self.text!r})'
 
 
+class TrackLine(Line):
+    """`Line` view of a `SubtitleTrack` line, changing text changes the track."""
+    __slots__ = ('_track', '_index')
+
+    # noinspection PyMissingConstructor
+    def __init__(self, track: SubtitleTrack, index: int):
+        self._track = track
+        self._index = index
+
+    @property
+    def ms(self) -> TimeLabel:
+        track, i = self._track, self._index
+        return TimeLabel(int(track.start[i]), int(track.end[i]), int(track.end[i] - track.start[i]))
+
+    @property
+    def text(self) -> str:
+        return self._track.texts[self._index]
+
+    @text.setter
+    def text(self, text: str):
+        self._track.texts[self._index] = text
+
+
+class SubtitleTrack:
+    """
+    Columnar subtitles: start and end (ms) NumPy arrays and a list of texts.
+    Indexing by int returns `TrackLine`, by slice returns a track sharing the arrays.
+    """
+    __slots__ = ('start', 'end', 'texts')
+
+    def __init__(self, start: Sequence[int], end: Sequence[int], texts: list[str]):
+        self.start = np.asarray(start, np.int64)
+        self.end = np.asarray(end, np.int64)
+        self.texts = texts
+
+    @classmethod
+    def from_lines(cls, lines: Iterable[Line]) -> SubtitleTrack:
+        labels = []
+        texts = []
+        for line in lines:
+            labels.append(line.ms[:2])
+            texts.append(line.text)
+        start, end = np.array(labels, np.int64).reshape(-1, 2).T
+        return cls(start, end, texts)
+
+    @property
+    def duration(self) -> np.ndarray:
+        return self.end - self.start
+
+    def gaps(self) -> np.ndarray:
+        """Time between the end of every line and the start of the next one (negative if they overlap)."""
+        return self.start[1:] - self.end[:-1]
+
+    def overlaps(self) -> np.ndarray:
+        """Mask of lines overlapping the next one."""
+        return self.gaps() < 0
+
+    def free_space(self, right_border: int = None) -> np.ndarray:
+        """Time from the start of every line to the start of the next one (or right_border)."""
+        if right_border is None:
+            right_border = int(self.end[-1]) if len(self) else 0
+        return np.append(self.start[1:], right_border) - self.start
+
+    def find(self, ms: int) -> int:
+        """Index of the last line starting at or before ms (-1 if none), lines must be sorted by start."""
+        return int(np.searchsorted(self.start, ms, 'right')) - 1
+
+    def appended(self, start: int, end: int, text: str = '') -> SubtitleTrack:
+        """New track with one more line."""
+        return SubtitleTrack(np.append(self.start, start), np.append(self.end, end), [*self.texts, text])
+
+    def lines(self) -> tuple[Line, ...]:
+        """Independent `Line` objects."""
+        return (*(Line(TimeLabel(start, end, end - start), text)
+                  for start, end, text in zip(self.start.tolist(), self.end.tolist(), self.texts)),)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def __getitem__(self, item: int | slice) -> TrackLine | SubtitleTrack:
+        if isinstance(item, slice):
+            return SubtitleTrack(self.start[item], self.end[item], self.texts[item])
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError('SubtitleTrack index out of range')
+        return TrackLine(self, item)
+
+    def __iter__(self) -> Iterator[TrackLine]:
+        return (TrackLine(self, i) for i in range(len(self)))
+
+    def __repr__(self):
+        return f'{self.__class__.__qualname__}({len(self)} lines)'
+
+
 def parse(text_or_file: str, skip_empty: bool = False) -> tuple[Line] | tuple:
+    """
+    Parses .srt, .vtt, .ass/.ssa file or text (other formats are converted to .srt by ffmpeg).
+    VTT and ASS/SSA styling is stripped.
+    """
     if os.path.isfile(text_or_file):
         fn, ext = os.path.splitext(text_or_file)
-        if ext != '.srt':
+        if (ext := ext.casefold()) not in _READERS:
             converted = f'{fn}.srt'
             FFmpegWrapper.convert('-i', text_or_file, converted)
-            text_or_file = converted
+            text_or_file, ext = converted, '.srt'
         text = _read_file(text_or_file)
     else:
         text = text_or_file
-    subtitles = ()
+        ext = ('.vtt' if text.lstrip('\ufeff \n').startswith('WEBVTT') else
+               '.ass' if text.lstrip('\ufeff \n').startswith('[Script Info]') else
+               '.srt')
+    subtitles = (*_READERS[ext](text),)
+    return (*(line for line in subtitles if line.text.strip()),) if skip_empty else subtitles
+
+
+def iter_srt(text: str) -> Iterator[Line]:
     for i in LINE_REGEX.split(f'\n\n{text.lstrip()}')[1:]:
         times_text: list[str, str] = i.split('\n', 1)
-        text = times_text[1].strip()
-        if not text:
+        if not (text := times_text[1].strip()):
             continue
-        subtitles += Line((*(datetime.time(k.hour, k.minute, k.second, k.microsecond) for k in
-                             [datetime.datetime.strptime(j.replace('.', ','), '%H:%M:%S,%f') for j in
-                              times_text[0].split(' --> ', 1)]),), text),
-    return (*(line for line in subtitles if line.text.strip()),) if skip_empty else subtitles
+        if not (times := TIME_LABEL_REGEX.match(times_text[0])):
+            raise ValueError(f'Invalid time label {times_text[0]!r}')
+        yield Line(TimeLabel(start := _ms_from_groups(*times.group(1, 2, 3, 4)),
+                             end := _ms_from_groups(*times.group(5, 6, 7, 8)),
+                             end - start), text)
+
+
+def iter_vtt(text: str) -> Iterator[Line]:
+    """WebVTT cues, cue settings and tags are stripped. NOTE, STYLE and REGION blocks are skipped."""
+    times = None
+    cue_text = []
+    for line in (*text.splitlines(), ''):
+        if times is None:
+            if found := VTT_TIME_LABEL_REGEX.match(line):
+                times = found
+            continue
+        if line.strip():
+            cue_text.append(line)
+            continue
+        if text := html.unescape(VTT_TAG_REGEX.sub('', '\n'.join(cue_text))).strip():
+            yield Line(TimeLabel(start := _ms_from_groups(*times.group(1, 2, 3, 4)),
+                                 end := _ms_from_groups(*times.group(5, 6, 7, 8)),
+                                 end - start), text)
+        times = None
+        cue_text.clear()
+
+
+def iter_ass(text: str) -> Iterator[Line]:
+    """
+    Dialogue events of ASS/SSA sorted by start (events of a file are not always in time order),
+    override tags are stripped.
+    """
+    return iter(sorted(_iter_ass_events(text), key=lambda line: line.ms.start))
+
+
+def _iter_ass_events(text: str) -> Iterator[Line]:
+    """Dialogue events of ASS/SSA in file order."""
+    fields = ('Layer', 'Start', 'End', 'Style', 'Name', 'MarginL', 'MarginR', 'MarginV', 'Effect', 'Text')
+    in_events = False
+    for line in text.splitlines():
+        if line.startswith('['):
+            in_events = line.strip().casefold() == '[events]'
+            continue
+        if not in_events:
+            continue
+        kind, _, values = line.partition(':')
+        if kind == 'Format':
+            fields = (*(field.strip() for field in values.split(',')),)
+        elif kind == 'Dialogue':
+            event = dict(zip(fields, values.split(',', len(fields) - 1)))
+            if not (text := ASS_TAG_REGEX.sub('', event.get('Text', '')).replace('\\N', '\n').replace(
+                    '\\n', '\n').replace('\\h', ' ').strip()):
+                continue
+            yield Line(TimeLabel(start := _ms_from_groups(*ASS_TIME_REGEX.match(event['Start']).groups()),
+                                 end := _ms_from_groups(*ASS_TIME_REGEX.match(event['End']).groups()),
+                                 end - start), text)
+
+
+_READERS = {'.srt': iter_srt, '.vtt': iter_vtt, '.ass': iter_ass, '.ssa': iter_ass}
 
 
 def unparse(subtitles: tuple[Line]) -> str:
@@ -1,35 +1,351 @@
 from __future__ import annotations
 
-from hashlib import md5
-from os.path import isfile
-from pathlib import Path
-from shutil import rmtree
+import json
+import math
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from importlib.metadata import PackageNotFoundError, version
+from queue import SimpleQueue
+from types import SimpleNamespace
+from typing import Callable, Iterable, Iterator, Sequence
 
 import pyttsx3
 
+from fastdub import audio, espeak_ng
 from fastdub.audio import AudioSegment
+from fastdub.cache import DEFAULT_CACHE_DIR, DEFAULT_CACHE_SIZE, TTSCache
 
-__all__ = ('UnknownVoice', 'VOICES_NAMES', 'VOICES_ID', 'Voicer')
+TTS_BATCH_SIZE = 32
+VOICES_CACHE_FILE = DEFAULT_CACHE_DIR.parent / 'voices.json'
+
+__all__ = ('UnknownVoice', 'TTS_BACKENDS', 'voice_names',
+           'TTSBackend', 'Pyttsx3Backend', 'EspeakNGBackend', 'Voicer')
 
 
 class UnknownVoice(Exception):
     __slots__ = ()
 
 
-_voices = pyttsx3.init().proxy.getProperty('voices')
-VOICES_NAMES = {i.name.casefold(): i for i in _voices}
-VOICES_ID = {i.id: i for i in _voices}
-del _voices
+def _package_version(package: str) -> str:
+    try:
+        return version(package)
+    except PackageNotFoundError:
+        return ''
+
+
+def _read_voices_cache() -> dict:
+    try:
+        return json.loads(VOICES_CACHE_FILE.read_text('UTF-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_voices_cache(voices_cache: dict):
+    VOICES_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_file = tempfile.mkstemp('.json', '.tmp-', VOICES_CACHE_FILE.parent)
+    with open(fd, 'w', encoding='UTF-8') as f:
+        json.dump(voices_cache, f)
+    os.replace(temp_file, VOICES_CACHE_FILE)
+
+
+class TTSBackend:
+    """
+    Speech synthesizer of `Voicer`. Has the current voice, rate and volume properties,
+    the voice anchor and cache keys of `Voicer` work the same for every backend.
+    The engine is started on first synthesis: voices and default properties are cached on disk
+    (`VOICES_CACHE_FILE`) by `TTSBackend.cache_id`, properties set before are applied to the engine.
+    Backends are pickled by their constructor arguments (TTS processes create their own).
+    """
+    __slots__ = ('_description', '_properties')
+    name = ''
+    # synthesizes a batch in parallel itself (Voicer does not start TTS processes)
+    parallel = False
+
+    def __init__(self):
+        self._description = None
+        self._properties = {}
+
+    def cache_id(self) -> str:
+        """Key of voices in the voices cache: backend, driver and their versions."""
+        raise NotImplementedError
+
+    def _describe(self) -> dict:
+        """Starts the engine, returns {'voices': [{'id': ..., 'name': ...}], 'defaults': {voice, rate, volume}}."""
+        raise NotImplementedError
+
+    def describe(self, refresh: bool = False) -> dict:
+        """`TTSBackend._describe` from the voices cache (refresh to start the engine and update it)."""
+        if self._description is None or refresh:
+            voices_cache, cache_id = _read_voices_cache(), self.cache_id()
+            if refresh or (description := voices_cache.get(cache_id)) is None:
+                description = voices_cache[cache_id] = self._describe()
+                _write_voices_cache(voices_cache)
+            self._description = description
+        return self._description
+
+    def voices(self, refresh: bool = False) -> list:
+        """Available voices (with id and name)."""
+        return [SimpleNamespace(**voice) for voice in self.describe(refresh)['voices']]
+
+    def get_property(self, name: str):
+        """voice (id), rate or volume."""
+        if name in self._properties:
+            return self._properties[name]
+        return self.describe()['defaults'][name]
+
+    def set_property(self, name: str, value):
+        if name not in ('voice', 'rate', 'volume'):
+            raise KeyError(f'unknown property {name}')
+        self._properties[name] = value
+
+    def properties(self) -> dict:
+        """Properties that affect the output besides the voice (part of the cache key)."""
+        return {'driver': self.name, 'rate': self.get_property('rate'), 'volume': self.get_property('volume')}
+
+    def synthesize_batch(self, jobs: Sequence[tuple[str, str, int]],
+                         temp_path: Callable[[], str]) -> list[str | AudioSegment]:
+        """
+        Synthesizes (text, voice id, rate) jobs, returns audio or WAV files (made by temp_path) in their order.
+        The current properties are kept.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def _default_driver_name() -> str:
+    return 'sapi5' if sys.platform == 'win32' else 'nsss' if sys.platform == 'darwin' else 'espeak'
+
+
+class Pyttsx3Backend(TTSBackend):
+    """pyttsx3 engine (SAPI5, NSSS, espeak): a batch is queued to the engine and synthesized by one runAndWait."""
+    __slots__ = ('driver_name', 'debug', '_engine', '_defaults')
+    name = 'pyttsx3'
+
+    def __init__(self, driver_name: str = None, debug: bool = False):
+        super().__init__()
+        self.driver_name = driver_name or _default_driver_name()
+        self.debug = debug
+        self._engine = None
+        self._defaults = None
+
+    def __reduce__(self):
+        return self.__class__, (self.driver_name, self.debug)
+
+    @property
+    def engine(self) -> pyttsx3.Engine:
+        """The engine, started on first use."""
+        if self._engine is None:
+            engine = pyttsx3.init(self.driver_name, self.debug)
+            self._defaults = {name: engine.proxy.getProperty(name) for name in ('voice', 'rate', 'volume')}
+            for name, value in self._properties.items():
+                engine.proxy.setProperty(name, value)
+            self._engine = engine
+        return self._engine
+
+    def cache_id(self) -> str:
+        return f'{self.name}:{self.driver_name}:{_package_version("pyttsx3")}'
+
+    def _describe(self) -> dict:
+        voices = self.engine.proxy.getProperty('voices')
+        return {'voices': [{'id': voice.id, 'name': voice.name} for voice in voices], 'defaults': self._defaults}
+
+    def get_property(self, name: str):
+        if self._engine is None:
+            return super().get_property(name)
+        return self._engine.proxy.getProperty(name)
+
+    def set_property(self, name: str, value):
+        if self._engine is None:
+            super().set_property(name, value)
+        else:
+            self._engine.proxy.setProperty(name, value)
+
+    def properties(self) -> dict:
+        return {**super().properties(), 'driver': f'pyttsx3.drivers.{self.driver_name}'}
+
+    def synthesize_batch(self, jobs: Sequence[tuple[str, str, int]],
+                         temp_path: Callable[[], str]) -> list[str]:
+        """Texts are queued grouped by voice and synthesized by one run of the engine loop."""
+        engine = self.engine
+        proxy = engine.proxy
+        base_voice, base_rate = proxy.getProperty('voice'), proxy.getProperty('rate')
+        voice, rate = base_voice, base_rate
+        files = [temp_path() for _ in jobs]
+        try:
+            for (text, voice_id, job_rate), file in sorted(zip(jobs, files), key=lambda job: job[0][1]):
+                if voice_id != voice:
+                    proxy.setProperty('voice', voice := voice_id)
+                if job_rate != rate:
+                    proxy.setProperty('rate', rate := job_rate)
+                engine.save_to_file(text, file, 'fastdub')
+            if rate != base_rate:
+                proxy.setProperty('rate', base_rate)
+            if voice != base_voice:
+                proxy.setProperty('voice', base_voice)
+            engine.runAndWait()
+        except BaseException:
+            for file in files:
+                with suppress(FileNotFoundError):
+                    os.remove(file)
+            raise
+        return files
+
+
+class _EspeakNGWorker:
+    """`fastdub.espeak_ng` worker process."""
+    __slots__ = ('process', 'defaults')
+
+    def __init__(self):
+        self.process = subprocess.Popen((sys.executable, '-m', 'fastdub.espeak_ng'),
+                                        stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self.defaults = json.loads(self._response())
+
+    def _response(self) -> bytes:
+        stdout = self.process.stdout
+        if len(header := stdout.read(espeak_ng.RESPONSE_HEADER.size)) < espeak_ng.RESPONSE_HEADER.size:
+            raise OSError(f'espeak-ng worker exited with code {self.process.wait()}')
+        size, = espeak_ng.RESPONSE_HEADER.unpack(header)
+        payload = stdout.read(abs(size))
+        if size < 0:
+            raise RuntimeError(f'espeak-ng: {payload.decode(errors="replace")}')
+        return payload
+
+    def request(self, **request) -> bytes:
+        self.process.stdin.write(json.dumps(request).encode() + b'\n')
+        self.process.stdin.flush()
+        return self._response()
+
+    def close(self):
+        with suppress(OSError):
+            self.process.stdin.close()
+        self.process.wait()
+
+
+class EspeakNGBackend(TTSBackend):
+    """
+    libespeak-ng in long-lived worker processes (see `fastdub.espeak_ng`) started on first synthesis:
+    texts are sent to their stdin, raw PCM is read from their stdout straight into memory,
+    no temporary files are written.
+    """
+    __slots__ = ('workers', 'frame_rate', '_idle', '_pool')
+    name = 'espeak-ng'
+    parallel = True
+
+    def __init__(self, workers: int = 1):
+        super().__init__()
+        self.workers = max(1, workers)
+        self.frame_rate = None
+        self._idle = SimpleQueue()
+        self._pool = None
+
+    def __reduce__(self):
+        return self.__class__, (self.workers,)
+
+    def _start(self):
+        if self._pool is not None:
+            return
+        self._pool = ThreadPoolExecutor(self.workers, 'espeak-ng')
+        for worker in self._pool.map(lambda _: _EspeakNGWorker(), range(self.workers)):
+            self.frame_rate = worker.defaults['frame_rate']
+            self._idle.put(worker)
+
+    def _request(self, **request) -> bytes:
+        self._start()
+        worker = self._idle.get()
+        try:
+            return worker.request(**request)
+        finally:
+            self._idle.put(worker)
+
+    def cache_id(self) -> str:
+        return f'{self.name}:{espeak_ng.library_version()}'
+
+    def _describe(self) -> dict:
+        voices = json.loads(self._request(voices=True))
+        worker = self._idle.get()
+        self._idle.put(worker)
+        return {'voices': voices, 'defaults': {name: worker.defaults[name] for name in ('voice', 'rate', 'volume')}}
+
+    def synthesize_batch(self, jobs: Sequence[tuple[str, str, int]],
+                         temp_path: Callable[[], str] = None) -> list[AudioSegment]:
+        """Jobs are synthesized by all workers at once."""
+        volume = self.get_property('volume')
+        self._start()
+        return [*self._pool.map(
+            lambda job: AudioSegment(self._request(text=job[0], voice=job[1], rate=job[2], volume=volume),
+                                     sample_width=2, frame_rate=self.frame_rate, channels=1), jobs)]
+
+    def close(self):
+        if self._pool is None:
+            return
+        self._pool.shutdown()
+        for _ in range(self.workers):
+            self._idle.get().close()
+        self._pool = None
+
+
+TTS_BACKENDS = {backend.name: backend for backend in (Pyttsx3Backend, EspeakNGBackend)}
+
+
+def voice_names(backend: str = Pyttsx3Backend.name, refresh: bool = False) -> list[str]:
+    """Casefolded names of voices of the backend (from the voices cache, see `TTSBackend.voices`)."""
+    tts_backend = TTS_BACKENDS[backend]()
+    try:
+        return [voice.name.casefold() for voice in tts_backend.voices(refresh)]
+    finally:
+        tts_backend.close()
+
+
+def __getattr__(name: str):
+    """`VOICES_NAMES` and `VOICES_ID` of the default backend are found on first use."""
+    if name in ('VOICES_NAMES', 'VOICES_ID'):
+        voices = Pyttsx3Backend().voices()
+        globals().update(VOICES_NAMES={voice.name.casefold(): voice for voice in voices},
+                         VOICES_ID={voice.id: voice for voice in voices})
+        return globals()[name]
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 
 def _no_update_voice_anchor(_):
     return False
 
 
+_worker_voicer: Voicer | None = None
+
+
+def _init_worker(cache: TTSCache, backend: TTSBackend, properties: dict, trim_silence: float | None):
+    global _worker_voicer
+    _worker_voicer = Voicer(None, None, cache=cache, backend=backend, trim_silence=trim_silence)
+    for name, value in properties.items():
+        backend.set_property(name, value)
+
+
+def _synthesize_in_worker(batch: list[tuple[str, tuple[str, str, int]]]) -> list[str]:
+    """Synthesizes (cache key, job) batch (skipping keys cached meanwhile by other processes), returns its keys."""
+    cached = _worker_voicer.cache.find((key for key, _ in batch), False)
+    _worker_voicer.synthesize_batch([(key, job) for key, job in batch if key not in cached])
+    return [key for key, _ in batch]
+
+
 class Voicer:
-    __slots__ = ('engine', 'cache_dir', '_update_voice_anchor', '_nul_file')
+    __slots__ = ('backend', 'cache', 'trim_silence', '_update_voice_anchor')
 
-    def __init__(self, cache_dir: str = None, anchor: str = '!:', tts_driver_name: str = None, tts_debug: bool = False):
+    def __init__(self, cache_dir: str = None, anchor: str = '!:', tts_driver_name: str = None, tts_debug: bool = False,
+                 cache_size: int = DEFAULT_CACHE_SIZE, cache: TTSCache = None, backend: TTSBackend = None,
+                 trim_silence: float | None = audio.TRIM_SILENCE_DBFS):
+        """
+        tts_driver_name and tts_debug are arguments of the default `Pyttsx3Backend`.
+        trim_silence is the dBFS threshold of leading and trailing silence cut from synthesized clips
+        (see `audio.trim_silence`), None to keep it.
+        """
         if anchor:
             def _update_voice_anchor(line: str) -> bool:
                 if line.startswith(anchor):
@@ -40,39 +356,175 @@ class Voicer:
             _update_voice_anchor = _no_update_voice_anchor
         self._update_voice_anchor = _update_voice_anchor
 
-        cache_dir = Path(__file__).parent / '_cached_texts' if cache_dir is None else Path(cache_dir)
-        cache_dir.mkdir(parents=True, exist_ok=True)
-        nul_file = cache_dir / 'nul.wav'
-        if not nul_file.is_file():
-            AudioSegment.silent(0).export(nul_file, 'wav')
-        self.cache_dir = cache_dir
-        self._nul_file = str(nul_file)
+        self.cache = TTSCache(cache_dir, cache_size) if cache is None else cache
+
+        self.backend = Pyttsx3Backend(tts_driver_name, tts_debug) if backend is None else backend
+        self.trim_silence = trim_silence
 
-        self.engine = pyttsx3.init(tts_driver_name, tts_debug)
+    @property
+    def engine(self) -> pyttsx3.Engine | None:
+        """pyttsx3 engine of `Pyttsx3Backend` (started on first use)."""
+        return getattr(self.backend, 'engine', None)
 
     def cleanup(self):
-        rmtree(self.cache_dir)
+        self.cache.clear()
 
     def set_voice(self, voice: str):
         voice_name = voice.casefold()
-        voice_property = self.engine.proxy.getProperty('voice')
-        voice = VOICES_NAMES.get(voice_name)
+        voices = {voice.name.casefold(): voice for voice in self.backend.voices()}
+        if voice_name not in voices:
+            voices = {voice.name.casefold(): voice for voice in self.backend.voices(True)}
+        voice = voices.get(voice_name)
         if not voice:
-            raise UnknownVoice(f'{voice_name} not in {str(tuple(VOICES_NAMES.keys()))}')
-        if VOICES_ID.get(voice_property).name.casefold() != voice_name:
-            self.engine.proxy.setProperty('voice', voice.id)
+            raise UnknownVoice(f'{voice_name} not in {str(tuple(voices.keys()))}')
+        if self.backend.get_property('voice') != voice.id:
+            self.backend.set_property('voice', voice.id)
 
-    def voice(self, text: str) -> str:
+    def resolve(self, text: str) -> tuple[str, str]:
+        """Applies the voice anchor (if any) and returns the text to be spoken with the voice id to speak it."""
         text = text.strip()
+        if text and self._update_voice_anchor((lines := text.splitlines())[0]):
+            text = '\n'.join(lines[1:])
+        return text, self.backend.get_property('voice')
+
+    def properties(self) -> dict:
+        """Engine properties and silence trimming that affect the output besides the voice (part of the cache key)."""
+        if self.trim_silence is None:
+            return self.backend.properties()
+        return {**self.backend.properties(), 'trim_silence': self.trim_silence}
+
+    def cache_key(self, text: str, voice_id: str, rate: int = None, properties: dict = None) -> str:
+        properties = self.properties() if properties is None else properties
+        if rate is not None:
+            properties = {**properties, 'rate': rate}
+        return TTSCache.key(text, voice=voice_id, **properties)
+
+    def synthesize(self, text: str, voice_id: str, rate: int = None) -> str:
+        """
+        Synthesizes already resolved text (see `Voicer.resolve`) if it is not cached.
+        rate is the engine rate for this text only (see `Voicer.fit_rates`).
+        """
         if not text:
-            return self._nul_file
+            return self.cache.nul_file
+        key = self.cache_key(text, voice_id, rate)
+        return self.cache.get(key) or self.synthesize_batch([(key, (text, voice_id, rate))])[key]
 
-        if self._update_voice_anchor((lines := text.splitlines())[0]):
-            text = '\n'.join(lines[1:])
+    def synthesize_batch(self, batch: Sequence[tuple[str, tuple[str, str, int | None]]]) -> dict[str, str]:
+        """
+        Synthesizes (cache key, (text, voice id, rate)) batch of cache misses by `TTSBackend.synthesize_batch`,
+        silence of clips is trimmed (see `Voicer.trim_silence`). Returns paths of cached files by keys.
+        """
+        return self._store(batch, *self._synthesize_clips(batch))
+
+    def _synthesize_clips(self, batch: Sequence[tuple[str, tuple[str, str, int | None]]]
+                          ) -> tuple[list[tuple[str, str, int]], list[str | AudioSegment]]:
+        """Jobs of the batch (with the engine rate) and their clips made by the backend, not cached yet."""
+        base_rate = self.backend.get_property('rate')
+        jobs = [(text, voice_id, base_rate if rate is None else rate) for _, (text, voice_id, rate) in batch]
+        return jobs, self.backend.synthesize_batch(jobs, self.cache.temp_path)
+
+    def _store(self, batch: Sequence[tuple[str, tuple[str, str, int | None]]], jobs: Sequence[tuple[str, str, int]],
+               clips: Sequence[str | AudioSegment]) -> dict[str, str]:
+        """Trims and caches clips of the batch (see `Voicer._synthesize_clips`), returns their paths by keys."""
+        return {key: self._put(key, clip, voice_id, len(text), rate)
+                for (key, _), clip, (text, voice_id, rate) in zip(batch, clips, jobs)}
+
+    def _put(self, key: str, clip: str | AudioSegment, voice_id: str, chars: int, rate: int) -> str:
+        """`TTSCache.put` of the clip with leading and trailing silence cut."""
+        trimmed_ms = 0.
+        if self.trim_silence is not None:
+            segment = AudioSegment.from_file(clip, 'wav') if isinstance(clip, str) else clip
+            if (trimmed := audio.trim_silence(segment, self.trim_silence)) is not segment:
+                trimmed_ms = segment.duration_ms - trimmed.duration_ms
+                if isinstance(clip, str):
+                    os.remove(clip)
+                clip = trimmed
+        return self.cache.put(key, clip, voice_id, chars, rate, trimmed_ms)
+
+    def fit_rates(self, jobs: Sequence[tuple[str, str]], slots_ms: Sequence[float], tolerance: float = 1.1,
+                  max_speedup: float = 2., step: float = .1) -> list[tuple[str, str, int | None]]:
+        """
+        Predicts durations of (text, voice id) jobs by speech rates of cached lines (see `TTSCache.speech_rates`)
+        and raises the engine rate of lines that would be longer than their slot more than tolerance times.
+        The speed-up is rounded up to step (so cache keys are stable) and limited to max_speedup.
+        Returns (text, voice id, rate or None) jobs.
+        """
+        base_rate = self.backend.get_property('rate')
+        ms_per_char = self.cache.speech_rates()
+        fitted = []
+        for (text, voice_id), slot_ms in zip(jobs, slots_ms):
+            rate = None
+            if text and voice_id in ms_per_char and base_rate:
+                speedup = len(text) * ms_per_char[voice_id] / base_rate / max(slot_ms, 1.)
+                if speedup > tolerance:
+                    speedup = min(math.ceil(round(speedup / step, 6)) * step, max_speedup)
+                    rate = round(base_rate * speedup)
+            fitted.append((text, voice_id, rate))
+        return fitted
+
+    def voice(self, text: str) -> str:
+        if not (text := text.strip()):
+            return self.cache.nul_file
+        return self.synthesize(*self.resolve(text))
+
+    def resolve_all(self, texts: Iterable[str]) -> list[tuple[str, str]]:
+        """`Voicer.resolve` for every text in order."""
+        return [self.resolve(text) for text in texts]
+
+    def voice_all(self, texts: Iterable[str], workers: int = 1) -> Iterator[str]:
+        """Voices texts keeping their order (see `Voicer.synthesize_all`)."""
+        return self.synthesize_all(self.resolve_all(texts), workers)
+
+    def voice_many(self, texts: Iterable[str], workers: int = 1) -> list[str]:
+        """
+        Paths of voiced texts in their order, cache misses are synthesized in batches
+        (see `Voicer.synthesize_all`).
+        """
+        return [*self.voice_all(texts, workers)]
 
-        cached_file = f'''{self.cache_dir / md5(f"{text}{self.engine.proxy.getProperty('voice')}".encode())
-        .hexdigest()}.wav'''
-        if not isfile(cached_file):
-            self.engine.save_to_file(text, cached_file, 'fastdub')
-            self.engine.runAndWait()
-        return cached_file
+    def synthesize_all(self, jobs: Iterable[tuple[str, str] | tuple[str, str, int | None]],
+                       workers: int = 1, batch_size: int = TTS_BATCH_SIZE, count_lookups: bool = True
+                       ) -> Iterator[str]:
+        """
+        Synthesizes resolved (text, voice id[, rate]) jobs keeping their order.
+        Cache keys are resolved up front, cache misses are synthesized by batches of batch_size
+        (one engine loop run per batch, see `Voicer.synthesize_batch`),
+        by ``workers`` independent engines in separate processes (unless the backend is parallel itself).
+        In this process a batch is synthesized while the previous one is decoded, trimmed and cached
+        by a background thread (the engine is used by the calling thread only).
+        Cache lookups are counted unless count_lookups is False (see `TTSCache.find`).
+        """
+        jobs = [(*job, None)[:3] for job in jobs]
+        properties = self.properties()
+        keys = [self.cache_key(*job, properties=properties) if job[0] else None for job in jobs]
+        cached = self.cache.find((key for key in keys if key), count_lookups)
+        pending = {key: job for key, job in zip(keys, jobs) if key and key not in cached}
+        paths = [cached.get(key) or self.cache.path(key) if key else self.cache.nul_file for key in keys]
+        items = [*pending.items()]
+        if workers < 2 or len(pending) < 2 or self.backend.parallel:
+            batches = (items[i:i + batch_size] for i in range(0, len(items), batch_size))
+            with ThreadPoolExecutor(1, 'fastdub-tts-store') as store:
+                stored = deque()
+                for key, path in zip(keys, paths):
+                    while key in pending:
+                        # at most one batch is stored while the next one is synthesized
+                        if len(stored) < 2 and (batch := next(batches, None)) is not None:
+                            stored.append(store.submit(self._store, batch, *self._synthesize_clips(batch)))
+                        else:
+                            for done in stored.popleft().result():
+                                del pending[done]
+                    yield path
+            return
+        batch_size = max(1, min(batch_size, math.ceil(len(items) / (workers * 4))))
+        batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+        with multiprocessing.Pool(min(workers, len(batches)), _init_worker,
+                                  (self.cache, self.backend,
+                                   {name: value for name, value in self.backend.properties().items()
+                                    if name != 'driver'},
+                                   self.trim_silence)) as pool:
+            done = pool.imap(_synthesize_in_worker, batches)
+            finished = set()
+            for key, path in zip(keys, paths):
+                while key in pending and key not in finished:
+                    finished.update(next(done))
+                yield path
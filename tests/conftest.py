@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from fastdub import voicer
+from fastdub.audio import AudioSegment
+
+MS_PER_CHAR = 60
+
+
+class FakeBackend(voicer.TTSBackend):
+    """Voices are installed names, a line is a tone of MS_PER_CHAR per character at the default rate."""
+    __slots__ = ('synthesized',)
+    name = 'test'
+    parallel = True
+    installed = ('Alice',)
+
+    def __init__(self):
+        super().__init__()
+        self.synthesized = []
+
+    def cache_id(self) -> str:
+        return self.name
+
+    def _describe(self) -> dict:
+        return {'voices': [{'id': name, 'name': name} for name in self.installed],
+                'defaults': {'voice': self.installed[0], 'rate': 200, 'volume': 1.}}
+
+    def synthesize_batch(self, jobs, temp_path=None):
+        self.synthesized += jobs
+        return [AudioSegment(np.full(int(len(text) * MS_PER_CHAR * 200 / rate * 22.05), 8000, np.int16).tobytes(),
+                             sample_width=2, frame_rate=22050, channels=1) for text, _, rate in jobs]
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    """FakeBackend in `voicer.TTS_BACKENDS` with its own voices cache."""
+    monkeypatch.setattr(voicer, 'VOICES_CACHE_FILE', tmp_path / 'voices.json')
+    monkeypatch.setitem(voicer.TTS_BACKENDS, FakeBackend.name, FakeBackend)
+    return FakeBackend()
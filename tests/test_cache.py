@@ -0,0 +1,15 @@
+import numpy as np
+import pytest
+
+from fastdub import cache
+from fastdub.audio import AudioSegment
+
+
+@pytest.mark.skipif(cache.soundfile is None, reason='soundfile is not installed')
+def test_flac_round_trip(tmp_path):
+    samples = (np.sin(np.arange(22050) / 10) * 8000).astype(np.int16)
+    clip = AudioSegment(samples.tobytes(), sample_width=2, frame_rate=22050, channels=1)
+    path = cache.TTSCache(tmp_path, clip_format='flac').put('key', clip)
+    assert path.endswith('.flac')
+    assert cache.clip_duration_ms(path) == 1000.
+    assert cache.read_clip(path).raw_data == clip.raw_data
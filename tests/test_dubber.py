@@ -0,0 +1,44 @@
+import os
+import shutil
+
+from fastdub import dubber, subtitles
+from fastdub.cache import TTSCache
+
+
+def test_jobs_budget_skips_unreadable_subtitles(tmp_path, monkeypatch):
+    monkeypatch.setattr(os, 'cpu_count', lambda: 4)
+    (good := tmp_path / 'good.srt').write_text('1\n00:00:01,000 --> 00:00:02,000\nHello\n')
+    (bad := tmp_path / 'bad.srt').write_text('1\nxx:00 --> 00:00:02,000\nHello\n')
+    assert dubber.jobs_budget([('good', None, str(good)), ('bad', None, str(bad))], 4) == 2
+
+
+def _srt(texts):
+    return '\n'.join(f'{i}\n{subtitles.ms_to_srt_time(i * 2000)} --> {subtitles.ms_to_srt_time(i * 2000 + 1500)}\n'
+                     f'{text}\n' for i, text in enumerate(texts, 1))
+
+
+def test_incremental_keeps_rates_of_unchanged_lines(tmp_path, monkeypatch, backend):
+    monkeypatch.setattr(dubber.VOICER, 'backend', backend)
+    monkeypatch.setattr(dubber.VOICER, 'cache', TTSCache(tmp_path / 'cache'))
+    monkeypatch.setattr(dubber.FFmpegWrapper, 'convert', lambda _, inp, out: shutil.copy(inp, out))
+    texts = [f'line {i} ' + 'word ' * (i % 9) for i in range(40)]
+    (sub := tmp_path / 'ep.srt').write_text(_srt(texts))
+    dub = dubber.Dubber(None, 'en', 'wav', False, 0., '', incremental=True, rate_control=True)
+    dub.dub_one('ep', None, str(sub))
+    # the rates predicted from the TTS cache have changed by the first run
+    texts[5] = 'edited line'
+    sub.write_text(_srt(texts))
+    backend.synthesized.clear()
+    dub.dub_one('ep', None, str(sub))
+    assert [text for text, *_ in backend.synthesized] == ['edited line']
+
+
+def test_planned_lines_are_counted_once(tmp_path, monkeypatch, backend):
+    monkeypatch.setattr(dubber.VOICER, 'backend', backend)
+    monkeypatch.setattr(dubber.VOICER, 'cache', tts_cache := TTSCache(tmp_path / 'cache'))
+    videos = {}
+    for fn, texts in (('ep1', [f'line {i}' for i in range(30)]), ('ep2', [f'line {i}' for i in range(10, 40)])):
+        (sub := tmp_path / f'{fn}.srt').write_text(_srt(texts))
+        videos[fn] = {'.srt': str(sub)}
+    dubber.Dubber(None, 'en', 'wav', False, 0., '').dub_dir(videos, '.mkv', '.srt')
+    assert (tts_cache.hits, tts_cache.misses) == (0, 40)
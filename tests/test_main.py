@@ -0,0 +1,21 @@
+import sys
+
+import pytest
+
+from fastdub import __main__, voicer
+
+
+def _parse(monkeypatch, *argv):
+    monkeypatch.setattr(sys, 'argv', ['fastdub', '-i', '.', '-ttsb', 'test', *argv])
+    return __main__.parse_args()
+
+
+def test_voice_installed_after_the_voices_cache(backend, monkeypatch):
+    assert voicer.voice_names(backend.name) == ['alice']
+    monkeypatch.setattr(type(backend), 'installed', ('Alice', 'Bob'))
+    assert _parse(monkeypatch, '-v', 'Bob').voice == 'bob'
+
+
+def test_unknown_voice(backend, monkeypatch):
+    with pytest.raises(SystemExit):
+        _parse(monkeypatch, '-v', 'Bob')
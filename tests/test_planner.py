@@ -0,0 +1,21 @@
+import numpy as np
+
+from fastdub import planner
+from fastdub.dubber import Dubber
+from fastdub.subtitles import SubtitleTrack, parse
+
+
+def test_empty_clip_is_not_sped_up():
+    positions, speeds = planner.plan([0, 1000, 2000], [900, 1900, 2900], [500, 0, 1500], 3000)
+    assert not np.isnan(speeds).any()
+    assert speeds[1] == 1.
+    assert positions[2] + 1500 / speeds[2] <= 3000
+
+
+def test_anchor_only_cue():
+    subs = SubtitleTrack.from_lines(parse('1\n00:00:00,000 --> 00:00:01,000\n!:Bob\n\n'
+                                          '2\n00:00:01,000 --> 00:00:02,000\nHello\n'))
+    subs = Dubber._with_right_border(subs, 3000)
+    dubber = Dubber(None, 'en', 'wav', False, 0., '')
+    plan = dubber._plan(subs, [0., 800.])
+    assert [speed for speed, *_ in plan] == [1., 1.]
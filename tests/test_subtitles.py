@@ -0,0 +1,9 @@
+from fastdub import subtitles
+
+
+def test_undecodable_file_is_read_twice(tmp_path, monkeypatch):
+    monkeypatch.setattr(subtitles, 'detect_encoding', lambda data: {'encoding': 'shift_jis'})
+    (file := tmp_path / 'broken.srt').write_bytes(b'1\n00:00:01,000 --> 00:00:02,000\nHello \xff\xfe\xfd\n')
+    first = subtitles._read_file(file)
+    assert first == subtitles._read_file(file)
+    assert first.endswith('Hello ���\n')